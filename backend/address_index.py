@@ -0,0 +1,186 @@
+# --- address_index.py (Per-address Balances and Transaction History) ---
+from decimal import Decimal, InvalidOperation
+
+from mempool import transaction_id
+from node_logging import get_logger
+
+log = get_logger('chain')
+
+ZERO = Decimal(0)
+# Page size limits for history queries
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 500
+
+
+def _parse_amount(value):
+    """Amounts are stored as strings; returns a finite Decimal or None if the value isn't one."""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return amount if amount.is_finite() else None
+
+
+def transfers_in_block(block):
+    """
+    Yields (position, transaction, amount, fee) for every transfer in the block's data.
+    Anything else (the genesis info entry, tampered or free-form data) is skipped.
+    """
+    for position, transaction in enumerate(block.data or ()):
+        if not isinstance(transaction, dict):
+            continue
+        if not isinstance(transaction.get('from_addr'), str) or not isinstance(transaction.get('to_addr'), str):
+            continue
+        amount = _parse_amount(transaction.get('amount'))
+        if amount is None:
+            continue
+        # A missing or unparseable fee counts as zero; a present one keeps its formatting ('0.0' stays '0.0')
+        fee = _parse_amount(transaction['fee']) if 'fee' in transaction else ZERO
+        if fee is None:
+            fee = ZERO
+        yield position, transaction, amount, fee
+
+
+class HistoryEntry:
+    """One side of a transfer as seen from one address."""
+    __slots__ = ('block_index', 'position', 'txid', 'direction', 'counterparty', 'amount', 'fee', 'timestamp')
+
+    def __init__(self, block_index, position, txid, direction, counterparty, amount, fee, timestamp):
+        self.block_index = block_index
+        self.position = position
+        self.txid = txid
+        self.direction = direction # 'in' or 'out'
+        self.counterparty = counterparty
+        self.amount = amount
+        self.fee = fee
+        self.timestamp = timestamp
+
+    def to_dict(self):
+        return {
+            'block_index': self.block_index,
+            'position': self.position,
+            'txid': self.txid,
+            'direction': self.direction,
+            'counterparty': self.counterparty,
+            'amount': str(self.amount),
+            'fee': str(self.fee),
+            'timestamp': self.timestamp
+        }
+
+
+class AddressState:
+    """Running totals plus the history list (oldest first) of one address."""
+    __slots__ = ('received', 'sent', 'fees_paid', 'history')
+
+    def __init__(self):
+        self.received = ZERO
+        self.sent = ZERO
+        self.fees_paid = ZERO
+        self.history = []
+
+    @property
+    def balance(self):
+        return self.received - self.sent - self.fees_paid
+
+
+class AddressIndex:
+    """
+    Balances and transaction history per address, kept in step with the chain.
+
+    apply_block() is called for every appended block, so the index never rescans the
+    chain except in rebuild() / catch_up(). Lookups are a dict access; a history page is a
+    slice of the address's list. rollback_to() undoes blocks from the tip down using a
+    per-height list of the addresses each block touched, which is what a chain
+    replacement needs before the new blocks are applied.
+
+    Balances are received - sent - fees_paid; there is no coinbase, so they can be negative.
+    Not thread-safe on its own: Blockchain callers already hold the chain lock.
+    """
+
+    def __init__(self):
+        self._addresses = {} # address -> AddressState
+        self._touched = [] # per block height: addresses given a history entry, in order
+
+    @property
+    def height(self):
+        """Number of blocks (chain[:height]) reflected in the index."""
+        return len(self._touched)
+
+    def rebuild(self, chain):
+        self._addresses.clear()
+        self._touched.clear()
+        self.catch_up(chain)
+
+    def catch_up(self, chain):
+        """Applies chain[height:], the blocks appended since the index was last in step."""
+        start = self.height
+        for block in chain[start:]:
+            self.apply_block(block)
+        log.info("Address index caught up: %s addresses over %s blocks (%s applied)",
+                 len(self._addresses), self.height, self.height - start)
+
+    def apply_block(self, block):
+        if block.index != self.height:
+            raise ValueError(f"Address index is at height {self.height}, got block #{block.index}")
+        touched = []
+        for position, transaction, amount, fee in transfers_in_block(block):
+            txid = transaction_id(transaction)
+            sender, recipient = transaction['from_addr'], transaction['to_addr']
+
+            state = self._state(sender)
+            state.sent += amount
+            state.fees_paid += fee
+            state.history.append(HistoryEntry(block.index, position, txid, 'out', recipient, amount, fee, block.timestamp))
+            touched.append(sender)
+
+            state = self._state(recipient)
+            state.received += amount
+            state.history.append(HistoryEntry(block.index, position, txid, 'in', sender, amount, ZERO, block.timestamp))
+            touched.append(recipient)
+        self._touched.append(touched)
+
+    def rollback_to(self, height):
+        """Undoes every block at height >= `height`, newest first."""
+        while self.height > height:
+            for address in reversed(self._touched.pop()):
+                state = self._addresses[address]
+                entry = state.history.pop()
+                if entry.direction == 'out':
+                    state.sent -= entry.amount
+                    state.fees_paid -= entry.fee
+                else:
+                    state.received -= entry.amount
+                if not state.history:
+                    del self._addresses[address]
+
+    def _state(self, address):
+        state = self._addresses.get(address)
+        if state is None:
+            state = self._addresses[address] = AddressState()
+        return state
+
+    def __contains__(self, address):
+        return address in self._addresses
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def summary(self, address):
+        """Totals for an address (all zero if it never appeared)."""
+        state = self._addresses.get(address) or AddressState()
+        return {
+            'address': address,
+            'balance': str(state.balance),
+            'received': str(state.received),
+            'sent': str(state.sent),
+            'fees_paid': str(state.fees_paid),
+            'transaction_count': len(state.history)
+        }
+
+    def history(self, address, offset=0, limit=DEFAULT_HISTORY_LIMIT):
+        """History entries newest first, skipping `offset` and returning at most `limit`."""
+        state = self._addresses.get(address)
+        if state is None or offset >= len(state.history):
+            return []
+        end = len(state.history) - offset
+        return [entry.to_dict() for entry in reversed(state.history[max(0, end - limit):end])]
@@ -0,0 +1,77 @@
+# --- bench_codec.py ---
+# Chain encode/decode throughput: JSON (the API's dict format) vs the binary block codec.
+# Usage: python bench_codec.py [--blocks 20000] [--transactions 5]
+import argparse
+import hashlib
+import io
+import json
+from time import perf_counter
+
+from blockchain import Block, MERKLE_BLOCK_VERSION
+from block_codec import encode_chain, decode_chain
+
+
+def synthetic_chain(count, transactions):
+    """Version 2 blocks with `transactions` transfers each; hashes aren't mined, only encoding is measured."""
+    chain = []
+    previous_hash = "0"
+    for index in range(count):
+        data = [{"from_addr": f"addr{index}", "to_addr": f"addr{t}", "amount": f"{t + 1}.0", "fee": "0.1"}
+                for t in range(transactions)]
+        block_hash = hashlib.sha256(index.to_bytes(8, 'big')).hexdigest()
+        chain.append(Block(index=index, timestamp_str=f"2025-01-01 00:00:00.{index % 1000000:06d}", data=data,
+                           previous_hash=previous_hash, difficulty=4, nonce=index * 31, hash_val=block_hash,
+                           mined_timestamp=1735689600.0 + index, version=MERKLE_BLOCK_VERSION))
+        previous_hash = block_hash
+    return chain
+
+
+def json_encode(chain):
+    return json.dumps({'chain': [block.to_dict() for block in chain]}).encode('utf-8')
+
+
+def json_decode(payload):
+    return [Block(index=d['index'], timestamp_str=d['timestamp'], data=d['data'], previous_hash=d['previous_hash'],
+                  difficulty=d['difficulty'], nonce=d['nonce'], hash_val=d['hash'], version=d['version'],
+                  merkle_root=d.get('merkle_root'))
+            for d in json.loads(payload)['chain']]
+
+
+def binary_encode(chain):
+    return b''.join(encode_chain(chain))
+
+
+def binary_decode(payload):
+    return list(decode_chain(io.BytesIO(payload)))
+
+
+def timed(function, argument, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function(argument)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chain encode/decode throughput, JSON vs binary")
+    parser.add_argument('--blocks', type=int, default=20000)
+    parser.add_argument('--transactions', type=int, default=5, help="Transactions per block")
+    args = parser.parse_args()
+
+    chain = synthetic_chain(args.blocks, args.transactions)
+    print(f"{args.blocks} blocks, {args.transactions} transactions each")
+    print(f"{'format':<8} {'MB':>7} {'encode MB/s':>12} {'decode MB/s':>12} {'encode blk/s':>13} {'decode blk/s':>13}")
+    for name, encode, decode in (("json", json_encode, json_decode), ("binary", binary_encode, binary_decode)):
+        payload, encode_time = timed(encode, chain)
+        decoded, decode_time = timed(decode, payload)
+        assert [block.hash_input() for block in decoded] == [block.hash_input() for block in chain]
+        mb = len(payload) / 1e6
+        print(f"{name:<8} {mb:>7.2f} {mb / encode_time:>12.1f} {mb / decode_time:>12.1f} "
+              f"{args.blocks / encode_time:>13.0f} {args.blocks / decode_time:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# --- bench_memory.py ---
+# In-memory header footprint: the previous Block layout (__dict__, hex-string hashes) vs slotted
+# Blocks with 32-byte hashes vs the ColumnarChain header columns.
+# Usage: python bench_memory.py [--count 1000000]
+import argparse
+import gc
+import hashlib
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from blockchain import Block
+from columnar_chain import ColumnarChain
+
+BASE_TIME = datetime(2025, 1, 1)
+
+
+class DictBlock:
+    """The block layout before __slots__: instance __dict__ and every hash as a 64-char hex string."""
+
+    def __init__(self, version, index, timestamp, data, previous_hash, difficulty, nonce, hash_val,
+                 mined_timestamp, merkle_root):
+        self.version = version
+        self.index = index
+        self.timestamp = timestamp
+        self.data = data
+        self.previous_hash = previous_hash
+        self.difficulty = difficulty
+        self.nonce = nonce
+        self.mined_timestamp = mined_timestamp
+        self.merkle_root = merkle_root
+        self.hash = hash_val
+
+
+def synthetic_headers(count):
+    """Fresh header field values (version 2, header-only: data None); hashes aren't mined."""
+    previous_hash = "0"
+    for index in range(count):
+        block_hash = hashlib.sha256(index.to_bytes(8, 'big')).hexdigest()
+        merkle_root = hashlib.sha256(b'm' + index.to_bytes(8, 'big')).hexdigest()
+        timestamp = (BASE_TIME + timedelta(seconds=10 * index, microseconds=index % 999983)).isoformat(
+            sep=' ', timespec='microseconds')
+        yield (2, index, timestamp, None, previous_hash, 4, index * 7919, block_hash, 1735689600.0 + 10 * index, merkle_root)
+        previous_hash = block_hash
+
+
+def build_dict_blocks(count):
+    return [DictBlock(*fields) for fields in synthetic_headers(count)]
+
+
+def build_slotted_blocks(count):
+    return [Block(index=index, timestamp_str=timestamp, data=data, previous_hash=previous_hash, difficulty=difficulty,
+                  nonce=nonce, hash_val=block_hash, mined_timestamp=mined, version=version, merkle_root=merkle_root)
+            for version, index, timestamp, data, previous_hash, difficulty, nonce, block_hash, mined, merkle_root
+            in synthetic_headers(count)]
+
+
+def build_columnar_chain(count):
+    chain = ColumnarChain()
+    for version, index, timestamp, data, previous_hash, difficulty, nonce, block_hash, mined, merkle_root in synthetic_headers(count):
+        chain.append(Block(index=index, timestamp_str=timestamp, data=data, previous_hash=previous_hash,
+                           difficulty=difficulty, nonce=nonce, hash_val=block_hash, mined_timestamp=mined,
+                           version=version, merkle_root=merkle_root))
+    return chain
+
+
+def measure(build, count):
+    """Returns (bytes retained by the built chain, seconds to build it)."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = perf_counter()
+    chain = build(count)
+    elapsed = perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del chain
+    return retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory block header footprint")
+    parser.add_argument('--count', type=int, default=1_000_000, help="Number of headers")
+    args = parser.parse_args()
+
+    layouts = [
+        ("dict Block, hex hashes", build_dict_blocks),
+        ("slotted Block, bytes hashes", build_slotted_blocks),
+        ("ColumnarChain", build_columnar_chain),
+    ]
+    print(f"{args.count} headers (build times include tracemalloc overhead)")
+    print(f"{'layout':<28} {'MB':>8} {'bytes/header':>13} {'build s':>8}")
+    for name, build in layouts:
+        retained, elapsed = measure(build, args.count)
+        print(f"{name:<28} {retained / 1e6:>8.1f} {retained / args.count:>13.1f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
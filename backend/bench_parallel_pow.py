@@ -0,0 +1,54 @@
+# --- bench_parallel_pow.py ---
+# Time-to-block scaling benchmark for the process-pool miner with 1..N workers.
+# Usage: python bench_parallel_pow.py [--difficulty 5] [--blocks 5] [--max-workers N]
+import argparse
+import multiprocessing
+from time import perf_counter
+
+from blockchain import Block
+from mining import MidstateMiner, ParallelMiner, DEFAULT_CHUNK_SIZE
+
+
+def make_templates(count, difficulty):
+    """Distinct block templates (different timestamps) so every run finds a different nonce."""
+    data = [{"from_addr": f"a{i}", "to_addr": f"b{i}", "amount": "1.0"} for i in range(50)]
+    templates = []
+    for i in range(count):
+        block = Block(index=1, timestamp_str=f"2025-01-01 00:00:{i:02d}.000000", data=data,
+                      previous_hash="ab" * 32, difficulty=difficulty, nonce=0, hash_val="")
+        templates.append(block.hash_template())
+    return templates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel proof-of-work scaling benchmark")
+    parser.add_argument('--difficulty', type=int, default=5)
+    parser.add_argument('--blocks', type=int, default=5, help="Blocks mined per worker count")
+    parser.add_argument('--max-workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    templates = make_templates(args.blocks, args.difficulty)
+
+    start = perf_counter()
+    for prefix, suffix in templates:
+        MidstateMiner(prefix, suffix, args.difficulty).search()
+    baseline = (perf_counter() - start) / len(templates)
+    print(f"difficulty={args.difficulty} blocks={args.blocks} chunk_size={args.chunk_size}")
+    print(f"{'workers':>8} {'s/block':>10} {'speedup':>9}")
+    print(f"{'serial':>8} {baseline:>10.3f} {1.0:>8.2f}x")
+
+    for workers in range(1, args.max_workers + 1):
+        miner = ParallelMiner(workers, args.chunk_size)
+        miner.mine(*templates[0], difficulty=1) # Warm up the pool outside the timed region
+        start = perf_counter()
+        for prefix, suffix in templates:
+            nonce, hash_hex = miner.mine(prefix, suffix, args.difficulty)
+            assert MidstateMiner(prefix, suffix, args.difficulty).hash_nonce(nonce) == hash_hex
+        elapsed = (perf_counter() - start) / len(templates)
+        miner.close()
+        print(f"{workers:>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# --- bench_pow.py ---
+# Hashes-per-second benchmark: legacy calculate_hash() loop vs the midstate mining engine.
+# Usage: python bench_pow.py [--attempts 20000] [--sizes 0,10,100,1000]
+import argparse
+from time import perf_counter
+
+from blockchain import Block
+from mining import MidstateMiner
+
+TIMESTAMP = "2025-01-01 00:00:00.000000"
+
+
+def make_block(num_transactions):
+    data = [
+        {"from_addr": f"sender-{i}", "to_addr": f"receiver-{i}", "amount": str(float(i + 1))}
+        for i in range(num_transactions)
+    ] or [{"info": "Genesis Block"}]
+    # Difficulty 64 is never met, so both loops run for exactly `attempts` nonces
+    return Block(index=1, timestamp_str=TIMESTAMP, data=data, previous_hash="ab" * 32,
+                 difficulty=64, nonce=0, hash_val="")
+
+
+def legacy_rate(block, attempts):
+    """The pre-engine proof_of_work loop: rebuild and re-serialize the block for every nonce."""
+    target = "0" * block.difficulty
+    start = perf_counter()
+    for nonce in range(attempts):
+        block.nonce = nonce
+        if block.calculate_hash()[:block.difficulty] == target:
+            break
+    return attempts / (perf_counter() - start)
+
+
+def midstate_rate(block, attempts):
+    start = perf_counter()
+    prefix, suffix = block.hash_template()
+    MidstateMiner(prefix, suffix, block.difficulty).search(0, attempts)
+    return attempts / (perf_counter() - start)
+
+
+def check_identical(block, samples=200):
+    prefix, suffix = block.hash_template()
+    miner = MidstateMiner(prefix, suffix, block.difficulty)
+    for nonce in range(samples):
+        block.nonce = nonce
+        assert miner.hash_nonce(nonce) == block.calculate_hash(), f"Hash mismatch at nonce {nonce}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proof-of-work hash rate benchmark")
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--sizes', default='0,10,100,1000', help="Comma-separated transaction counts")
+    args = parser.parse_args()
+
+    print(f"{'txs':>6} {'legacy H/s':>14} {'midstate H/s':>14} {'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        block = make_block(size)
+        check_identical(block)
+        # Legacy loop gets fewer attempts on big blocks so the run stays short
+        legacy_attempts = max(200, args.attempts // max(1, size // 10))
+        legacy = legacy_rate(block, legacy_attempts)
+        midstate = midstate_rate(block, args.attempts)
+        print(f"{size:>6} {legacy:>14,.0f} {midstate:>14,.0f} {midstate / legacy:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
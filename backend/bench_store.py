@@ -0,0 +1,56 @@
+# --- bench_store.py ---
+# Block store restart benchmark: time to reopen a store and load the chain tip at growing chain lengths.
+# Usage: python bench_store.py [--sizes 1000,10000,100000]
+import argparse
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+from blockchain import Block, Blockchain
+from block_store import BlockStore
+
+
+def fill_store(directory, length):
+    """Writes `length` synthetic blocks (hashes aren't mined, only the storage layer is measured)."""
+    store = BlockStore(directory, sync_every=1000)
+    previous_hash = "0"
+    for index in range(len(store), length):
+        data = [{"from_addr": f"a{index}", "to_addr": f"b{t}", "amount": f"{t + 1}.0"} for t in range(5)]
+        block_hash = f"{index:064x}"
+        store.append(Block(index=index, timestamp_str="2025-01-01 00:00:00.000000", data=data,
+                           previous_hash=previous_hash, difficulty=1, nonce=0, hash_val=block_hash,
+                           mined_timestamp=float(index)))
+        previous_hash = block_hash
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block store restart benchmark")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Comma-separated chain lengths")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='block-store-bench-')
+    try:
+        print(f"{'blocks':>9} {'log MB':>8} {'restart ms':>11} {'random read us':>15}")
+        for size in sorted(int(s) for s in args.sizes.split(',')):
+            fill_store(directory, size)
+            start = perf_counter()
+            node = Blockchain(store=BlockStore(directory))
+            restart = perf_counter() - start
+
+            start = perf_counter()
+            reads = 1000
+            for i in range(reads):
+                node.chain[(i * 7919) % size]
+            random_read = (perf_counter() - start) / reads
+            node.store.close()
+
+            log_mb = os.path.getsize(os.path.join(directory, 'blocks.log')) / 1e6
+            print(f"{size:>9} {log_mb:>8.1f} {restart * 1000:>11.2f} {random_read * 1e6:>15.1f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# --- bench_validation.py ---
+# Serial vs process-pool batch validation on synthetic chains.
+# Usage: python bench_validation.py [--sizes 10000,100000,1000000] [--workers N]
+import argparse
+import multiprocessing
+from time import perf_counter
+
+from blockchain import Block, Blockchain
+from mining import MidstateMiner
+from validation import BatchValidator, DEFAULT_VALIDATION_CHUNK_SIZE
+
+
+def build_chain(length, difficulty=1, transactions_per_block=5):
+    """Mines a synthetic chain at a low difficulty using the midstate engine."""
+    chain = []
+    previous_hash = "0"
+    for index in range(length):
+        data = [{"from_addr": f"a{index}", "to_addr": f"b{t}", "amount": f"{t + 1}.0"}
+                for t in range(transactions_per_block)]
+        block = Block(index=index, timestamp_str=f"2025-01-01 00:00:00.{index % 1000000:06d}", data=data,
+                      previous_hash=previous_hash, difficulty=difficulty, nonce=0, hash_val="", mined_timestamp=0.0)
+        block.nonce, block.hash = MidstateMiner(*block.hash_template(), difficulty).search()
+        chain.append(block)
+        previous_hash = block.hash
+    return chain
+
+
+def time_serial(chain):
+    start = perf_counter()
+    result = Blockchain.validate_chain_structure(chain)
+    return perf_counter() - start, result
+
+
+def time_batch(validator, chain):
+    start = perf_counter()
+    result = validator.validate(chain)
+    return perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chain validation benchmark")
+    parser.add_argument('--sizes', default='10000,100000', help="Comma-separated chain lengths")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_VALIDATION_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    # Pool started once up front, as app.py does; its startup is not part of the timings
+    validator = BatchValidator(args.workers, args.chunk_size).start()
+    print(f"workers={args.workers} chunk_size={args.chunk_size}")
+    print(f"{'blocks':>9} {'serial s':>10} {'batch s':>10} {'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        chain = build_chain(size)
+        # Tamper with a late block so both validators must find the same failure
+        chain[size * 3 // 4].data = [{"tampered": True}]
+        serial_time, serial_result = time_serial(chain)
+        batch_time, batch_result = time_batch(validator, chain)
+        assert serial_result == batch_result, (serial_result, batch_result)
+        print(f"{size:>9} {serial_time:>10.2f} {batch_time:>10.2f} {serial_time / batch_time:>8.2f}x")
+    validator.close()
+
+
+if __name__ == '__main__':
+    main()
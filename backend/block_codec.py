@@ -0,0 +1,172 @@
+# --- block_codec.py (Compact Binary Block / Chain Encoding) ---
+import json
+import struct
+
+from blockchain import Block, LEGACY_BLOCK_VERSION
+
+# Media type used for content negotiation on the chain and validation endpoints
+CHAIN_MIMETYPE = 'application/x-blockchain'
+# A chain is MAGIC + FORMAT_VERSION followed by one length-prefixed record per block, until EOF
+MAGIC = b'BCHN'
+FORMAT_VERSION = 1
+STREAM_HEADER = MAGIC + bytes([FORMAT_VERSION])
+RECORD_LENGTH = struct.Struct('>I')
+# Fixed-width part of a record: block version, flags, difficulty, index, nonce, mined timestamp (float seconds)
+FIXED_FIELDS = struct.Struct('>BBBQQd')
+TEXT_LENGTH = struct.Struct('>I')
+HASH_SIZE = 32
+# Longest record accepted when decoding (a block is at most MAX_BLOCK_BYTES of transactions plus its header)
+MAX_RECORD_BYTES = 1 << 20
+
+# Flags: which optional / variable-length fields follow the fixed part. Order after the fixed
+# part: hash, previous_hash, merkle_root (each 32 raw bytes or length-prefixed text),
+# timestamp (length-prefixed text, kept verbatim since it is hashed as a string), data.
+HASH_RAW = 0x01 # hash as 32 raw bytes (else text)
+PREVIOUS_HASH_RAW = 0x02 # previous_hash as 32 raw bytes (else text)
+MERKLE_ROOT_RAW = 0x04 # merkle_root as 32 raw bytes
+MERKLE_ROOT_TEXT = 0x08 # merkle_root as text (neither flag: no Merkle root)
+NO_DATA = 0x10 # header-only block (data None); otherwise compact JSON of data comes last
+
+# Reused instead of json.dumps/json.loads, which build a new encoder per call for non-default options
+_encode_data = json.JSONEncoder(separators=(',', ':')).encode
+_decode_data = json.JSONDecoder().decode
+
+
+def _text(value):
+    encoded = value.encode('utf-8')
+    return TEXT_LENGTH.pack(len(encoded)) + encoded
+
+
+def _hash_field(value, raw_flag):
+    """(flag, encoded field) for a packed hash value: raw bytes when canonical, text otherwise."""
+    if type(value) is bytes:
+        return raw_flag, value
+    return 0, _text(value)
+
+
+def encode_block(block):
+    """
+    One block as a binary record (without the length prefix). Everything calculate_hash()
+    uses is kept exactly: hashes that are canonical hex go in as 32 raw bytes and anything
+    else as text, data as compact JSON in its own key order (hashing sorts keys itself, so
+    the hash input is unchanged and the decoded dicts are identical, order included).
+    Raises ValueError if a numeric field doesn't fit its fixed width.
+    """
+    block_hash, previous_hash, merkle_root = block.packed_hashes()
+    if block_hash is None:
+        raise ValueError(f"Block #{block.index} has no hash to encode.")
+    hash_flag, hash_field = _hash_field(block_hash, HASH_RAW)
+    previous_flag, previous_field = _hash_field(previous_hash, PREVIOUS_HASH_RAW)
+    flags = hash_flag | previous_flag
+    parts = [hash_field, previous_field]
+    if type(merkle_root) is bytes:
+        flags |= MERKLE_ROOT_RAW
+        parts.append(merkle_root)
+    elif merkle_root is not None:
+        flags |= MERKLE_ROOT_TEXT
+        parts.append(_text(merkle_root))
+    parts.append(_text(block.timestamp))
+    if block.data is None:
+        flags |= NO_DATA
+    else:
+        parts.append(_encode_data(block.data).encode('utf-8'))
+
+    try:
+        fixed = FIXED_FIELDS.pack(block.version, flags, block.difficulty, block.index, block.nonce,
+                                  block.mined_timestamp)
+    except struct.error as e:
+        raise ValueError(f"Block #{block.index} can't be binary encoded: {e}") from e
+    return fixed + b''.join(parts)
+
+
+def _read_hash(record, offset, raw):
+    if raw:
+        end = offset + HASH_SIZE
+        if end > len(record):
+            raise ValueError("truncated hash")
+        return bytes(record[offset:end]), end
+    return _read_text(record, offset)
+
+
+def _read_text(record, offset):
+    length = TEXT_LENGTH.unpack_from(record, offset)[0]
+    start = offset + TEXT_LENGTH.size
+    end = start + length
+    if end > len(record):
+        raise ValueError("truncated text field")
+    return str(record[start:end], 'utf-8'), end
+
+
+def decode_block(record):
+    """Rebuilds a Block from encode_block() output. Raises ValueError on malformed records."""
+    try:
+        version, flags, difficulty, index, nonce, mined_timestamp = FIXED_FIELDS.unpack_from(record)
+        offset = FIXED_FIELDS.size
+        block_hash, offset = _read_hash(record, offset, flags & HASH_RAW)
+        previous_hash, offset = _read_hash(record, offset, flags & PREVIOUS_HASH_RAW)
+        merkle_root = None
+        if flags & (MERKLE_ROOT_RAW | MERKLE_ROOT_TEXT):
+            merkle_root, offset = _read_hash(record, offset, flags & MERKLE_ROOT_RAW)
+        timestamp, offset = _read_text(record, offset)
+        data = None if flags & NO_DATA else _decode_data(str(record[offset:], 'utf-8'))
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed block record: {e}") from e
+    if version != LEGACY_BLOCK_VERSION and data is not None and not isinstance(data, list):
+        raise ValueError(f"Malformed block record: version {version} block data must be a list")
+
+    return Block(
+        index=index,
+        timestamp_str=timestamp,
+        data=data,
+        previous_hash=previous_hash,
+        difficulty=difficulty,
+        nonce=nonce,
+        hash_val=block_hash,
+        mined_timestamp=mined_timestamp,
+        version=version,
+        merkle_root=merkle_root
+    )
+
+
+def encode_chain(blocks):
+    """Yields the binary chain stream piece by piece (header, then one record per block)."""
+    yield STREAM_HEADER
+    for block in blocks:
+        record = encode_block(block)
+        yield RECORD_LENGTH.pack(len(record)) + record
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    while data and len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+def decode_chain(stream):
+    """
+    Yields Blocks from a binary chain stream (any object with read(), e.g. a file or a
+    request body) one record at a time, so memory doesn't grow with the chain.
+    Raises ValueError on a bad header, an oversized or truncated record.
+    """
+    if _read_exact(stream, len(STREAM_HEADER)) != STREAM_HEADER:
+        raise ValueError(f"Not a version {FORMAT_VERSION} binary chain (bad header).")
+    position = 0
+    while True:
+        prefix = _read_exact(stream, RECORD_LENGTH.size)
+        if not prefix:
+            return
+        if len(prefix) != RECORD_LENGTH.size:
+            raise ValueError(f"Truncated record length for block at index {position}.")
+        length = RECORD_LENGTH.unpack(prefix)[0]
+        if length > MAX_RECORD_BYTES:
+            raise ValueError(f"Record of block at index {position} is longer than {MAX_RECORD_BYTES} bytes.")
+        record = _read_exact(stream, length)
+        if len(record) != length:
+            raise ValueError(f"Truncated record for block at index {position}.")
+        yield decode_block(record)
+        position += 1
+
@@ -0,0 +1,278 @@
+# --- block_store.py (Persistent Append-only Block Store) ---
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from time import monotonic
+
+from node_logging import get_logger
+
+log = get_logger('chain')
+
+LOG_FILENAME = 'blocks.log'
+INDEX_FILENAME = 'blocks.idx'
+# Every log record is a 4-byte big-endian length and a CRC32 of the payload, followed by
+# that many bytes of JSON
+RECORD_HEADER = struct.Struct('>II')
+# Defaults for fsync batching: sync after this many appends or this many seconds, whichever first
+DEFAULT_SYNC_EVERY = 32
+DEFAULT_SYNC_INTERVAL = 1.0
+# Decoded blocks kept in memory by PersistentChain
+DEFAULT_BLOCK_CACHE_SIZE = 1024
+
+
+def block_to_record(block):
+    """Everything needed to rebuild the Block exactly, including mined_timestamp for difficulty adjustment."""
+    record = block.to_dict()
+    record['mined_timestamp'] = block.mined_timestamp
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+def block_from_record(raw):
+    from blockchain import Block # Imported here: blockchain.py imports this module
+    record = json.loads(raw)
+    return Block(
+        index=record['index'],
+        timestamp_str=record['timestamp'],
+        data=record['data'],
+        previous_hash=record['previous_hash'],
+        difficulty=record['difficulty'],
+        nonce=record['nonce'],
+        hash_val=record['hash'],
+        mined_timestamp=record['mined_timestamp'],
+        # Records written before block versions existed are version 1
+        version=record.get('version', 1),
+        merkle_root=record.get('merkle_root')
+    )
+
+
+class BlockStore:
+    """
+    Durable block storage in a directory holding two files:
+
+    blocks.log  append-only sequence of length-prefixed, CRC32-checked block records
+    blocks.idx  compact offset index, one unsigned 64-bit log offset per block height
+
+    Reading block N is one index lookup plus one read from the memory-mapped log; nothing
+    is scanned. Opening an existing store only loads the index (8 bytes per block) and
+    checks the tail, so startup stays nearly flat as the chain grows. Appends are flushed
+    to the OS right away and fsync'ed in batches (sync_every blocks / sync_interval seconds);
+    a record torn or zero-filled by a crash fails its checksum and is cut off, together with
+    everything after it, on the next open.
+    """
+
+    def __init__(self, directory, sync_every=DEFAULT_SYNC_EVERY, sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._log_path = os.path.join(directory, LOG_FILENAME)
+        self._index_path = os.path.join(directory, INDEX_FILENAME)
+        self._log = open(self._log_path, 'a+b')
+        self._index_file = open(self._index_path, 'a+b')
+        self._offsets = array('Q')
+        self._map = None
+        self._unsynced = 0
+        self._last_sync = monotonic()
+        self._load_index()
+
+    # --- Opening / recovery ---
+    def _load_index(self):
+        index_size = os.path.getsize(self._index_path)
+        with open(self._index_path, 'rb') as f:
+            self._offsets.fromfile(f, index_size // self._offsets.itemsize)
+        log_size = os.path.getsize(self._log_path)
+
+        # Only the last sync_every records can have been appended since the last fsync, so only
+        # they are verified; an indexed record that fails is dropped with everything after it
+        # (index written, log lost or zero-filled). Earlier records stay unread.
+        for height in range(max(len(self._offsets) - self.sync_every, 0), len(self._offsets)):
+            if self._verified_record_end(self._offsets[height], log_size) is None:
+                del self._offsets[height:]
+                break
+        end = self._record_end(self._offsets[-1]) if self._offsets else 0
+
+        # Re-index records written to the log after the last index entry, up to the first
+        # one that fails to verify
+        recovered = 0
+        next_end = self._verified_record_end(end, log_size)
+        while next_end is not None:
+            self._offsets.append(end)
+            end, next_end = next_end, self._verified_record_end(next_end, log_size)
+            recovered += 1
+        if end < log_size:
+            log.warning("Block store %s: discarding %s bytes from the first torn or corrupt record to the end of the log",
+                        self.directory, log_size - end)
+            self._log.truncate(end)
+        if recovered or index_size != len(self._offsets) * self._offsets.itemsize:
+            self._rewrite_index()
+            log.info("Block store %s: index repaired (%s blocks re-indexed)", self.directory, recovered)
+
+    def _record_end(self, offset):
+        self._log.seek(offset)
+        return offset + RECORD_HEADER.size + RECORD_HEADER.unpack(self._log.read(RECORD_HEADER.size))[0]
+
+    def _verified_record_end(self, offset, log_size):
+        """
+        End offset of the record at `offset`, or None unless it lies entirely within the log,
+        matches its checksum and parses as JSON.
+        """
+        if offset + RECORD_HEADER.size > log_size:
+            return None
+        self._log.seek(offset)
+        length, checksum = RECORD_HEADER.unpack(self._log.read(RECORD_HEADER.size))
+        end = offset + RECORD_HEADER.size + length
+        if end > log_size:
+            return None
+        raw = self._log.read(length)
+        if zlib.crc32(raw) != checksum:
+            return None
+        try:
+            json.loads(raw)
+        except ValueError: # Also covers invalid UTF-8
+            return None
+        return end
+
+    def _rewrite_index(self):
+        self._index_file.truncate(0)
+        self._offsets.tofile(self._index_file)
+        self._index_file.flush()
+        os.fsync(self._index_file.fileno())
+
+    # --- Reading ---
+    def __len__(self):
+        return len(self._offsets)
+
+    def read(self, height):
+        """Returns the raw record bytes of the block at `height`."""
+        offset = self._offsets[height]
+        end = self._record_end_mapped(offset)
+        return self._map[offset + RECORD_HEADER.size:end]
+
+    def _record_end_mapped(self, offset):
+        if self._map is None or offset + RECORD_HEADER.size > len(self._map):
+            self._remap()
+        length = RECORD_HEADER.unpack_from(self._map, offset)[0]
+        end = offset + RECORD_HEADER.size + length
+        if end > len(self._map):
+            self._remap()
+        return end
+
+    def _remap(self):
+        self._log.flush()
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._log.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_block(self, height):
+        return block_from_record(self.read(height))
+
+    # --- Writing ---
+    def append(self, block):
+        """Appends a block record; it must be the next height."""
+        if block.index != len(self._offsets):
+            raise ValueError(f"Block store expects height {len(self._offsets)}, got block #{block.index}")
+        record = block_to_record(block)
+        self._log.seek(0, os.SEEK_END)
+        offset = self._log.tell()
+        self._log.write(RECORD_HEADER.pack(len(record), zlib.crc32(record)) + record)
+        self._log.flush()
+        self._offsets.append(offset)
+        self._index_file.write(self._offsets[-1:].tobytes())
+        self._index_file.flush()
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        fsyncs the log, then the index. This doesn't keep the index behind the log on disk:
+        append() hands both files to the OS right away, so after a power loss the index may
+        point past what reached the log. Consistency comes from recovery on the next open,
+        which drops index entries whose record is missing or fails its checksum, re-indexes
+        verified records the index lacks and cuts the log at the first record that fails. Blocks appended since the last sync()
+        can be lost; earlier ones can't.
+        """
+        if self._unsynced:
+            os.fsync(self._log.fileno())
+            os.fsync(self._index_file.fileno())
+            self._unsynced = 0
+        self._last_sync = monotonic()
+
+    def truncate(self, length):
+        """Drops every block at height >= length (used when the chain is replaced)."""
+        if length >= len(self._offsets):
+            return
+        log_end = self._offsets[length]
+        del self._offsets[length:]
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._log.truncate(log_end)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._rewrite_index()
+
+    def close(self):
+        self.sync()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._log.close()
+        self._index_file.close()
+
+
+class PersistentChain:
+    """
+    List-like view of a BlockStore that Blockchain uses as its `chain`.
+    Blocks are decoded lazily on access and kept in a small LRU cache.
+    """
+
+    def __init__(self, store, cache_size=DEFAULT_BLOCK_CACHE_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.store)
+
+    def __bool__(self):
+        return len(self.store) > 0
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        length = len(self.store)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("chain index out of range")
+        block = self._cache.get(position)
+        if block is None:
+            block = self.store.get_block(position)
+            self._remember(position, block)
+        else:
+            self._cache.move_to_end(position)
+        return block
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def _remember(self, position, block):
+        self._cache[position] = block
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def append(self, block):
+        self.store.append(block)
+        self._remember(len(self.store) - 1, block)
+
+    def truncate(self, length):
+        self.store.truncate(length)
+        for position in [p for p in self._cache if p >= length]:
+            del self._cache[position]
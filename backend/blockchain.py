@@ -1,18 +1,79 @@
 # --- blockchain.py (Revised Timestamp Handling & Validation Logging) ---
 import hashlib
 import json
-from time import time
+import logging
+from collections import OrderedDict
+from time import time, perf_counter
 from datetime import datetime
+from mining import MidstateMiner, ParallelMiner, DEFAULT_CHUNK_SIZE
+from metrics import REGISTRY
+from block_store import PersistentChain
+from columnar_chain import ColumnarChain
+from node_logging import get_logger
+from merkle import merkle_root as compute_merkle_root
+from address_index import AddressIndex
+
+chain_log = get_logger('chain')
+difficulty_log = get_logger('difficulty')
+mining_log = get_logger('mining')
+validation_log = get_logger('validation')
 
 # --- Configuration ---
 BLOCK_GENERATION_INTERVAL = 10
 DIFFICULTY_ADJUSTMENT_INTERVAL = 5
 MIN_DIFFICULTY = 1
+# Block dicts kept by get_chain_data() (most recently used; older ones are rebuilt on demand)
+BLOCK_DICT_CACHE_SIZE = 4096
+
+# --- Block versions ---
+# 1: the hash covers the whole block including the data list (original format)
+# 2: the hash covers a fixed-size header that commits to the data through a Merkle root
+LEGACY_BLOCK_VERSION = 1
+MERKLE_BLOCK_VERSION = 2
+SUPPORTED_BLOCK_VERSIONS = (LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION)
+# Version given to newly mined blocks
+BLOCK_VERSION = MERKLE_BLOCK_VERSION
+
+
+def block_work(difficulty):
+    """Expected number of hashes to mine a block at `difficulty` leading hex zeros."""
+    return 16 ** difficulty
+
+
+def pack_hash(value):
+    """
+    Stores a canonical hash (64 lowercase hex chars) as its 32 raw bytes. Anything else
+    (the genesis previous_hash "0", malformed hashes in submitted chains) is kept as given,
+    so unpack_hash() always returns exactly the original string. Raw 32-byte digests
+    (e.g. decoded by block_codec) are taken as they are.
+    """
+    if type(value) is bytes:
+        if len(value) != 32:
+            raise ValueError(f"Raw hashes must be 32 bytes, got {len(value)}")
+        return value
+    if type(value) is str and len(value) == 64:
+        try:
+            packed = bytes.fromhex(value)
+        except ValueError:
+            return value
+        if packed.hex() == value:
+            return packed
+    return value
+
+
+def unpack_hash(value):
+    return value.hex() if type(value) is bytes else value
 
 
 class Block:
+    # No per-instance __dict__; hashes are held as 32-byte bytes (see pack_hash) and exposed as hex strings
+    __slots__ = ('version', 'index', 'timestamp', 'data', '_previous_hash', 'difficulty', 'nonce',
+                 'mined_timestamp', '_merkle_root', '_hash')
+
     # Constructor now takes timestamp_str directly
-    def __init__(self, index, timestamp_str, data, previous_hash, difficulty, nonce=0, hash_val=None, mined_timestamp=None):
+    def __init__(self, index, timestamp_str, data, previous_hash, difficulty, nonce=0, hash_val=None, mined_timestamp=None,
+                 version=LEGACY_BLOCK_VERSION, merkle_root=None):
+        self.version = version
         self.index = index
         self.timestamp = timestamp_str # Store the exact string used for hashing
         self.data = data # Should be a list of transactions/dicts
@@ -22,36 +83,138 @@ class Block:
         # Record the Unix time when mining finished (for difficulty adjustment)
         # If mined_timestamp (Unix float) is provided, use it, else record current time
         self.mined_timestamp = mined_timestamp if mined_timestamp is not None else time()
+        # Version 2 blocks commit to their data through a Merkle root, computed once here
+        # unless it's given (stored blocks, or header-only blocks that carry no data)
+        if version >= MERKLE_BLOCK_VERSION and merkle_root is None and data is not None:
+            merkle_root = compute_merkle_root(data)
+        self.merkle_root = merkle_root if version >= MERKLE_BLOCK_VERSION else None
 
         # Hash calculation happens only if hash_val is None (newly mined or genesis)
         # Uses the stored self.timestamp string directly
         self.hash = hash_val if hash_val is not None else self.calculate_hash()
 
-    def calculate_hash(self):
-        """Calculates the SHA-256 hash of the block using stored string timestamp."""
-        block_content = {
+    @property
+    def hash(self):
+        return unpack_hash(self._hash)
+
+    @hash.setter
+    def hash(self, value):
+        self._hash = pack_hash(value)
+
+    def packed_hashes(self):
+        """(hash, previous_hash, merkle_root) as stored: 32-byte bytes when canonical, else the original string/None."""
+        return self._hash, self._previous_hash, self._merkle_root
+
+    @property
+    def previous_hash(self):
+        return unpack_hash(self._previous_hash)
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self._previous_hash = pack_hash(value)
+
+    @property
+    def merkle_root(self):
+        return unpack_hash(self._merkle_root)
+
+    @merkle_root.setter
+    def merkle_root(self, value):
+        self._merkle_root = pack_hash(value)
+
+    def header(self, merkle_root=None):
+        """Fixed-size version 2 header: everything that is hashed, with data replaced by its Merkle root."""
+        return {
+            "version": self.version,
             "index": self.index,
-            "timestamp": self.timestamp, # Use the stored string directly
-            "data": self.data,
+            "timestamp": self.timestamp,
+            "merkle_root": merkle_root if merkle_root is not None else self.merkle_root,
             "previous_hash": self.previous_hash,
             "difficulty": self.difficulty,
             "nonce": self.nonce
         }
+
+    def header_only(self):
+        """Copy of the block without its data, as sent in headers-first sync."""
+        block_hash, previous_hash, merkle_root = self.packed_hashes()
+        return Block(self.index, self.timestamp, None, previous_hash, self.difficulty, self.nonce, block_hash,
+                     self.mined_timestamp, self.version, merkle_root)
+
+    def hash_input(self, merkle_root=None):
+        """
+        The exact bytes calculate_hash() hashes.
+        Version 1: the whole block content including the data list.
+        Version 2: the header, with the Merkle root recomputed from data (so tampered data
+        changes the hash) unless the caller already did that and passes it in; header-only
+        blocks (data None) use their stored root.
+        """
+        if self.version == LEGACY_BLOCK_VERSION:
+            block_content = {
+                "index": self.index,
+                "timestamp": self.timestamp, # Use the stored string directly
+                "data": self.data,
+                "previous_hash": self.previous_hash,
+                "difficulty": self.difficulty,
+                "nonce": self.nonce
+            }
+        elif self.version == MERKLE_BLOCK_VERSION:
+            if merkle_root is None and self.data is not None:
+                merkle_root = compute_merkle_root(self.data)
+            block_content = self.header(merkle_root)
+        else:
+            raise ValueError(f"Unsupported block version {self.version!r} for block index {self.index}.")
         try:
             # Use separators=(',', ':') for the most compact, unambiguous JSON representation
             # Ensure UTF-8 encoding
-            block_string = json.dumps(block_content, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            return json.dumps(block_content, sort_keys=True, separators=(',', ':')).encode('utf-8')
         except TypeError as e:
             # Add logging for serialization errors
-            print(f"!!! ERROR Serializing block content for hashing block index {self.index}: {e}")
-            print(f"    Content causing error: {block_content}")
+            chain_log.error("Serializing block content for hashing block index %s failed: %s. Content: %r",
+                            self.index, e, block_content)
             raise # Re-raise the error after logging
 
-        return hashlib.sha256(block_string).hexdigest()
+    def calculate_hash(self, merkle_root=None):
+        """Calculates the SHA-256 hash of the block using stored string timestamp."""
+        return hashlib.sha256(self.hash_input(merkle_root)).hexdigest()
+
+    def recalculate_hash(self):
+        """
+        calculate_hash() for validation, or None if a version 2 block's stored merkle_root
+        doesn't match its data. The hash only covers the recomputed root, but the stored one
+        is what headers, the binary codec and Merkle proofs hand out, so it must match too.
+        """
+        if self.version != MERKLE_BLOCK_VERSION or self.data is None:
+            return self.calculate_hash()
+        merkle_root = compute_merkle_root(self.data)
+        if pack_hash(merkle_root) != self._merkle_root:
+            return None
+        return self.calculate_hash(merkle_root)
+
+    def hash_template(self):
+        """
+        Returns the canonical hash input split around the nonce as (prefix, suffix) bytes,
+        so prefix + str(nonce) + suffix is exactly what calculate_hash() hashes.
+        With sort_keys a version 1 block is ordered data, difficulty, index, nonce, previous_hash,
+        timestamp; a version 2 header is difficulty, index, merkle_root, nonce, previous_hash,
+        timestamp, version.
+        """
+        if self.version == LEGACY_BLOCK_VERSION:
+            head_content = {"data": self.data, "difficulty": self.difficulty, "index": self.index}
+            tail_content = {"previous_hash": self.previous_hash, "timestamp": self.timestamp}
+        else:
+            header = self.header()
+            head_content = {key: header[key] for key in ("difficulty", "index", "merkle_root")}
+            tail_content = {key: header[key] for key in ("previous_hash", "timestamp", "version")}
+        head = json.dumps(head_content, sort_keys=True, separators=(',', ':'))
+        tail = json.dumps(tail_content, sort_keys=True, separators=(',', ':'))
+        # Drop the closing brace of head and the opening brace of tail, splice the nonce key in between
+        prefix = (head[:-1] + ',"nonce":').encode('utf-8')
+        suffix = (',' + tail[1:]).encode('utf-8')
+        return prefix, suffix
 
     def to_dict(self):
         """Returns a dictionary representation of the block."""
-        return {
+        block_dict = {
+            "version": self.version,
             "index": self.index,
             "timestamp": self.timestamp, # Return the stored string timestamp
             "data": self.data,
@@ -62,17 +225,66 @@ class Block:
             # Optional: Include mined_timestamp for frontend debugging/display if needed
             # "mined_timestamp_unix": self.mined_timestamp
         }
+        if self.merkle_root is not None:
+            block_dict["merkle_root"] = self.merkle_root
+        return block_dict
 
 
 class Blockchain:
-    def __init__(self, initial_difficulty=4):
-        self.chain = []
+    def __init__(self, initial_difficulty=4, mining_workers=1, mining_chunk_size=DEFAULT_CHUNK_SIZE, store=None,
+                 block_version=BLOCK_VERSION, columnar=False, genesis_block=None, difficulty_adjustment_interval=None,
+                 block_generation_interval=None, clock=None):
+        # With a BlockStore the chain is persisted and read back lazily; otherwise it's kept in memory,
+        # either as a list of Blocks or (columnar=True) as compact header columns
+        self.store = store
+        if store is not None:
+            self.chain = PersistentChain(store)
+        else:
+            self.chain = ColumnarChain() if columnar else []
         self.difficulty = max(MIN_DIFFICULTY, initial_difficulty)
-        self.create_genesis_block()
+        # Version (header format) of blocks this node mines; older blocks keep the version they were mined with
+        self.block_version = block_version
+        # Blocks between difficulty adjustments (None = DIFFICULTY_ADJUSTMENT_INTERVAL, 0 = keep difficulty fixed)
+        self.difficulty_adjustment_interval = (DIFFICULTY_ADJUSTMENT_INTERVAL if difficulty_adjustment_interval is None
+                                               else difficulty_adjustment_interval)
+        # Target seconds per block (None = BLOCK_GENERATION_INTERVAL)
+        self.block_generation_interval = (BLOCK_GENERATION_INTERVAL if block_generation_interval is None
+                                          else block_generation_interval)
+        # Source of Unix time for block timestamps and mined_timestamp; simulations pass a fake clock
+        self.clock = clock or time
+        # mining_workers > 1 mines on a process pool (None = one worker per CPU core)
+        self.mining_workers = mining_workers
+        self.mining_chunk_size = mining_chunk_size
+        # Started here, before the caller starts any threads (see ParallelMiner)
+        self._parallel_miner = (ParallelMiner(mining_workers, mining_chunk_size).start() if mining_workers != 1
+                                else None)
+        # Hash of the tip the difficulty was last adjusted for, so a cancelled mining
+        # attempt followed by a retry on the same tip doesn't adjust twice
+        self._difficulty_adjusted_for = None
+        # height -> to_dict() of chain[height], least recently used first (blocks never change once appended)
+        self._block_dicts = OrderedDict()
+        # Balances/history per address, updated as blocks are appended once it has caught up.
+        # A reopened store isn't indexed at startup (that would decode every block); the first
+        # get_address_index() call does it
+        self.address_index = AddressIndex()
+        # Called as listener(fork_height, removed_blocks, added_blocks) after replace_chain()
+        self._replace_listeners = []
+        # Called as listener(block) after a block is appended on top of the tip (commit_block / accept_block)
+        self._block_listeners = []
+        if self.chain:
+            # Reopened an existing store: carry on from its tip instead of re-mining a genesis block
+            self.difficulty = max(MIN_DIFFICULTY, self.get_latest_block().difficulty)
+            chain_log.info("Loaded chain of %s blocks from %s. Tip: %s..., Difficulty: %s",
+                           len(self.chain), store.directory, self.get_latest_block().hash[:10], self.difficulty)
+        elif genesis_block is not None:
+            # Nodes of one network share a genesis block instead of each mining their own
+            self.accept_block(genesis_block)
+        else:
+            self.create_genesis_block()
 
     def create_genesis_block(self):
         """Creates the Genesis block and performs PoW."""
-        genesis_time_unix = time()
+        genesis_time_unix = self.clock()
         # *** Generate timestamp string ONCE using a standard format ***
         # ISO format is generally good and includes microseconds by default
         genesis_timestamp_str = datetime.fromtimestamp(genesis_time_unix).isoformat(sep=' ', timespec='microseconds')
@@ -86,7 +298,8 @@ class Blockchain:
             difficulty=self.difficulty,
             nonce=0,
             mined_timestamp=genesis_time_unix, # Pass the Unix time for adjustment logic
-            hash_val=None # Calculate hash after PoW
+            hash_val=None, # Calculate hash after PoW
+            version=self.block_version
         )
 
         # proof_of_work will modify genesis_block.nonce and return (nonce, hash)
@@ -96,70 +309,111 @@ class Blockchain:
         genesis_block.hash = final_hash # Assign the calculated valid hash
 
         self.chain.append(genesis_block)
+        self._index_block(genesis_block)
+        REGISTRY.counter('blocks_mined').inc()
         # Log the exact timestamp string used
-        print(f"Genesis block created and mined. Nonce: {genesis_block.nonce}, Hash: {genesis_block.hash[:10]}..., Difficulty: {genesis_block.difficulty}, Timestamp: '{genesis_timestamp_str}'")
+        chain_log.info("Genesis block created and mined. Nonce: %s, Hash: %s..., Difficulty: %s, Timestamp: '%s'",
+                       genesis_block.nonce, genesis_block.hash[:10], genesis_block.difficulty, genesis_timestamp_str)
 
 
     def get_latest_block(self):
         return self.chain[-1]
 
-    def proof_of_work(self, block):
-        """Finds a nonce that satisfies the difficulty target."""
-        block.nonce = 0
-        target = "0" * block.difficulty
-        calculated_hash = block.calculate_hash() # Initial hash
-
-        while calculated_hash[:block.difficulty] != target:
-            block.nonce += 1
-            calculated_hash = block.calculate_hash() # Recalculate
-
-        # print(f"Block mined with nonce: {block.nonce}, Hash: {calculated_hash}") # Optional: Verbose logging
+    def proof_of_work(self, block, cancel_event=None, progress=None):
+        """
+        Finds a nonce that satisfies the difficulty target.
+        Optional cancel_event / progress(nonces_tried) hooks are used by background mining jobs;
+        MiningCancelled is raised if cancel_event gets set first.
+        """
+        attempts = 0
+
+        def count_attempts(nonces):
+            nonlocal attempts
+            attempts += nonces
+            if progress is not None:
+                progress(nonces)
+
+        started = perf_counter()
+        try:
+            # Serialize the nonce-independent part of the block once, then only hash nonces
+            prefix, suffix = block.hash_template()
+            if self.mining_workers == 1:
+                miner = MidstateMiner(prefix, suffix, block.difficulty)
+                if cancel_event is None and progress is None:
+                    block.nonce, calculated_hash = miner.search()
+                    attempts = block.nonce + 1
+                else:
+                    block.nonce, calculated_hash = miner.mine(cancel_event, count_attempts)
+            else:
+                block.nonce, calculated_hash = self._parallel_miner.mine(prefix, suffix, block.difficulty,
+                                                                         cancel_event, count_attempts)
+        finally:
+            elapsed = perf_counter() - started
+            REGISTRY.counter('hash_attempts').inc(attempts)
+
+        REGISTRY.histogram('block_mining_seconds').observe(elapsed)
+        if elapsed > 0:
+            REGISTRY.gauge('hash_rate').set(attempts / elapsed)
+        mining_log.debug("Block mined with nonce: %s, Hash: %s (%s attempts in %.3fs)",
+                         block.nonce, calculated_hash, attempts, elapsed)
         return block.nonce, calculated_hash
 
     def adjust_difficulty(self):
         """Adjusts difficulty based on block generation time."""
         latest_block = self.get_latest_block()
+        if self._difficulty_adjusted_for == latest_block.hash:
+            return self.difficulty
+        self._difficulty_adjusted_for = latest_block.hash
 
-        if latest_block.index % DIFFICULTY_ADJUSTMENT_INTERVAL == 0 and latest_block.index > 0:
+        interval = self.difficulty_adjustment_interval
+        if interval and latest_block.index % interval == 0 and latest_block.index > 0:
             try:
-                prev_adjustment_block = self.chain[-(DIFFICULTY_ADJUSTMENT_INTERVAL + 1)]
+                prev_adjustment_block = self.chain[-(interval + 1)]
             except IndexError:
-                 print("Warning: Could not find previous adjustment block for difficulty calculation.")
+                 difficulty_log.warning("Could not find previous adjustment block for difficulty calculation.")
                  return self.difficulty
 
             actual_time = latest_block.mined_timestamp - prev_adjustment_block.mined_timestamp
-            expected_time = DIFFICULTY_ADJUSTMENT_INTERVAL * BLOCK_GENERATION_INTERVAL
+            expected_time = interval * self.block_generation_interval
 
-            print(f"\n--- Difficulty Adjustment Check @ Block {latest_block.index} ---")
-            print(f"  Time for last {DIFFICULTY_ADJUSTMENT_INTERVAL} blocks: {actual_time:.2f}s (Expected: {expected_time}s)")
-            print(f"  Current difficulty: {self.difficulty}")
+            difficulty_log.info("Difficulty adjustment check @ block %s: last %s blocks took %.2fs (expected %ss), current difficulty %s",
+                                latest_block.index, interval, actual_time, expected_time, self.difficulty)
 
             if actual_time < expected_time / 1.5:
                 self.difficulty += 1
-                print(f"  Mining too fast. Increasing difficulty to: {self.difficulty}")
+                difficulty_log.info("Mining too fast. Increasing difficulty to: %s", self.difficulty)
             elif actual_time > expected_time * 1.5:
                 new_difficulty = max(MIN_DIFFICULTY, self.difficulty - 1)
                 if new_difficulty != self.difficulty:
-                     print(f"  Mining too slow. Decreasing difficulty to: {new_difficulty}")
+                     difficulty_log.info("Mining too slow. Decreasing difficulty to: %s", new_difficulty)
                      self.difficulty = new_difficulty
                 else:
-                     print(f"  Mining too slow, but already at minimum difficulty ({MIN_DIFFICULTY}).")
+                     difficulty_log.info("Mining too slow, but already at minimum difficulty (%s).", MIN_DIFFICULTY)
             else:
-                 print("  Block generation time within target range. Difficulty unchanged.")
-            print("-" * 40)
+                 difficulty_log.info("Block generation time within target range. Difficulty unchanged.")
 
         return self.difficulty
 
 
     def add_block(self, data):
         """Creates, mines, and adds a new block."""
+        new_block = self.prepare_block(data)
+        # Perform Proof of Work
+        mined_nonce, final_hash = self.proof_of_work(new_block)
+        return self.commit_block(new_block, final_hash)
+
+    def prepare_block(self, data):
+        """
+        Builds the next (not yet mined) block on top of the current tip.
+        Split from add_block so callers can run proof_of_work without holding a chain lock.
+        """
         if not isinstance(data, list):
              # Maybe allow non-list data but log a warning? For now, enforce list.
              raise ValueError("Block data must be provided as a list (e.g., of transactions).")
 
         latest_block = self.get_latest_block()
         current_difficulty = self.adjust_difficulty() # Check/adjust difficulty first
-        block_time_unix = time()
+        block_time_unix = self.clock()
         # *** Generate timestamp string ONCE using a standard format ***
         block_timestamp_str = datetime.fromtimestamp(block_time_unix).isoformat(sep=' ', timespec='microseconds')
 
@@ -171,109 +425,258 @@ class Blockchain:
             difficulty=current_difficulty,
             nonce=0,
             mined_timestamp=block_time_unix, # Pass Unix time for adjustment logic
-            hash_val=None # Calculate hash after PoW
+            hash_val=None, # Calculate hash after PoW
+            version=self.block_version
         )
+        return new_block
 
-        # Perform Proof of Work
-        mined_nonce, final_hash = self.proof_of_work(new_block)
+    def commit_block(self, new_block, final_hash):
+        """Appends a block mined by proof_of_work (which left the winning nonce on it)."""
+        latest_block = self.get_latest_block()
+        if new_block.index != latest_block.index + 1 or new_block.previous_hash != latest_block.hash:
+            raise ValueError(f"Block #{new_block.index} no longer extends the chain tip (#{latest_block.index}).")
 
         # Assign results from PoW
         new_block.hash = final_hash
         # Update mined_timestamp to the *actual* time PoW finished
         # This is important for the *next* difficulty adjustment calculation
-        new_block.mined_timestamp = time()
+        new_block.mined_timestamp = self.clock()
 
         self.chain.append(new_block)
+        self._index_block(new_block)
+        REGISTRY.counter('blocks_mined').inc()
         # Log the exact timestamp string used
-        print(f"Block #{new_block.index} added. Nonce: {new_block.nonce}, Hash: {new_block.hash[:10]}..., Difficulty: {new_block.difficulty}, Timestamp: '{block_timestamp_str}'")
+        chain_log.info("Block #%s added. Nonce: %s, Hash: %s..., Difficulty: %s, Timestamp: '%s'",
+                       new_block.index, new_block.nonce, new_block.hash[:10], new_block.difficulty, new_block.timestamp)
+        self._notify_block_listeners(new_block)
         return new_block
 
-    def get_chain_data(self):
-        """Returns the chain as a list of dictionaries."""
-        return [block.to_dict() for block in self.chain]
+    def chain_work(self, start=0):
+        """Total expected hashes behind chain[start:]; fork choice prefers the branch with more."""
+        return sum(block_work(block.difficulty) for block in self.chain[start:])
+
+    def add_replace_listener(self, listener):
+        """Registers listener(fork_height, removed_blocks, added_blocks), called after every replace_chain()."""
+        self._replace_listeners.append(listener)
+
+    def add_block_listener(self, listener):
+        """Registers listener(block), called after every block appended by commit_block() or accept_block()."""
+        self._block_listeners.append(listener)
+
+    def _index_block(self, block):
+        # Only while the index is in step with the chain; otherwise get_address_index() catches up later
+        if self.address_index.height == block.index:
+            self.address_index.apply_block(block)
+
+    def get_address_index(self):
+        """
+        The AddressIndex, first brought up to the chain tip. Only the first call after
+        reopening a stored chain has work to do (every block is read once). Call with the
+        chain lock held.
+        """
+        if self.address_index.height < len(self.chain):
+            self.address_index.catch_up(self.chain)
+        return self.address_index
+
+    def _notify_block_listeners(self, block):
+        for listener in self._block_listeners:
+            try:
+                listener(block)
+            except Exception:
+                # The block is on the chain by now; a failing listener must not make the caller
+                # (e.g. a mining job) treat it as failed and requeue its transactions
+                chain_log.exception("Block listener %r failed for block #%s", listener, block.index)
+
+    def accept_block(self, block):
+        """Appends a block mined elsewhere (gossip, a shared genesis block) after checking it against the tip."""
+        previous_block = self.chain[-1] if self.chain else None
+        if not self.check_block(block, previous_block, len(self.chain)):
+            raise ValueError(f"Block #{block.index} is invalid or doesn't extend the chain tip.")
+        self.chain.append(block)
+        self._index_block(block)
+        # Difficulty carries on from the new tip
+        self.difficulty = max(MIN_DIFFICULTY, block.difficulty)
+        self._difficulty_adjusted_for = None
+        chain_log.debug("Block #%s accepted. Hash: %s...", block.index, block.hash[:10])
+        self._notify_block_listeners(block)
+        return block
+
+    def replace_chain(self, new_chain):
+        """
+        Switches to `new_chain` (a list of Blocks), keeping the prefix both chains share.
+        The new chain must be structurally valid; choosing *whether* to switch is up to the caller.
+        Blocks past the fork point are rolled back out of the address index and the caches,
+        then the new blocks are appended. Returns the fork height.
+        """
+        result = self.validate_chain_structure(new_chain)
+        if not result['is_valid']:
+            raise ValueError(f"Replacement chain is invalid at block {result['first_invalid_index']}.")
+
+        fork_height = 0
+        shared = min(len(self.chain), len(new_chain))
+        while fork_height < shared and self.chain[fork_height].hash == new_chain[fork_height].hash:
+            fork_height += 1
+        self._switch_branch(fork_height, list(new_chain[fork_height:]))
+        return fork_height
+
+    def replace_suffix(self, fork_height, new_blocks):
+        """
+        Replaces chain[fork_height:] with `new_blocks`, checking only the new blocks (the first
+        one against chain[fork_height - 1]). Used by sync, where the shared prefix is our own
+        chain and re-validating it would be wasted work. Raises ValueError if a block is invalid.
+        """
+        if not 0 < fork_height <= len(self.chain):
+            raise ValueError(f"Fork height {fork_height} is outside the chain (length {len(self.chain)}).")
+        previous_block = self.chain[fork_height - 1]
+        for position, block in enumerate(new_blocks, fork_height):
+            if not self.check_block(block, previous_block, position):
+                raise ValueError(f"Replacement block at index {position} is invalid.")
+            previous_block = block
+        self._switch_branch(fork_height, list(new_blocks))
+        return fork_height
+
+    def _switch_branch(self, fork_height, added_blocks):
+        removed_blocks = self.chain[fork_height:]
+        self.address_index.rollback_to(fork_height)
+        if isinstance(self.chain, list):
+            del self.chain[fork_height:]
+        else:
+            self.chain.truncate(fork_height)
+        for height in [h for h in self._block_dicts if h >= fork_height]:
+            del self._block_dicts[height]
+        for block in added_blocks:
+            self.chain.append(block)
+            self._index_block(block)
+
+        # Difficulty carries on from the new tip
+        self.difficulty = max(MIN_DIFFICULTY, self.get_latest_block().difficulty)
+        self._difficulty_adjusted_for = None
+        chain_log.info("Chain replaced at height %s: %s blocks removed, %s added. Tip: %s..., Difficulty: %s",
+                       fork_height, len(removed_blocks), len(added_blocks), self.get_latest_block().hash[:10], self.difficulty)
+        for listener in self._replace_listeners:
+            try:
+                listener(fork_height, removed_blocks, added_blocks)
+            except Exception:
+                chain_log.exception("Replace listener %r failed at fork height %s", listener, fork_height)
+
+    def get_chain_data(self, start=0, end=None):
+        """
+        Returns the chain (or the slice chain[start:end]) as a list of dictionaries.
+        Only blocks in the slice are read. Their dicts go into a bounded cache keyed by
+        height, so repeated reads of recent blocks don't re-serialize them.
+        """
+        end = len(self.chain) if end is None else min(end, len(self.chain))
+        cache = self._block_dicts
+        block_dicts = []
+        for height in range(max(0, start), end):
+            block_dict = cache.get(height)
+            if block_dict is None:
+                block_dict = cache[height] = self.chain[height].to_dict()
+                if len(cache) > BLOCK_DICT_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(height)
+            block_dicts.append(block_dict)
+        return block_dicts
+
+    def contains_block(self, index, block_hash):
+        """
+        Returns True if the block at `index` has hash `block_hash`, i.e. a client holding
+        the chain up to `index` can catch up with just the blocks after it.
+        """
+        return 0 <= index < len(self.chain) and self.chain[index].hash == block_hash
+
+    # --- Static Validation Method (with DETAILED debug logging) ---
+    @staticmethod
+    def check_block(block, previous_block, position, debug=False):
+        """
+        Checks one block: against previous_block (index order, hash link) or, when that is
+        None, as the genesis block; then its version, Merkle root, hash and Proof of Work. Logs the reason
+        and returns False on the first problem. Only the two blocks are needed, so streamed
+        chains can be checked as they arrive.
+        """
+        if previous_block is None:
+            if debug:
+                validation_log.debug("Validating genesis block (index %s)", block.index)
+            if block.index != 0:
+                 validation_log.info("Validation error: Genesis block index is not 0 (found %s).", block.index)
+                 return False
+        else:
+            # Check index order
+            if block.index != previous_block.index + 1:
+                 validation_log.info("Validation error: Index mismatch at block %s. Expected %s, got %s.",
+                                     position, previous_block.index + 1, block.index)
+                 return False
+
+            # Check previous hash link
+            if block._previous_hash != previous_block._hash: # Packed values, no hex conversion
+                validation_log.info("Validation error: Previous hash link broken at block %s (previous_hash %s, block %s hash %s).",
+                                    position, block.previous_hash, position - 1, previous_block.hash)
+                return False
+
+        if block.version not in SUPPORTED_BLOCK_VERSIONS:
+            validation_log.info("Validation error: Unsupported version %r at block %s.", block.version, position)
+            return False
+
+        # Check hash recalculation (Tampering check), and that the stored Merkle root matches the data
+        calculated_hash = block.recalculate_hash()
+        if calculated_hash is None:
+            validation_log.info("Validation error: Merkle root mismatch at block %s (stored %s doesn't match the data).",
+                                position, block.merkle_root)
+            return False
+        if debug:
+            validation_log.debug("Block #%s: stored hash %s, recalculated hash %s", block.index, block.hash, calculated_hash)
+        if block.hash != calculated_hash:
+            validation_log.info("Validation error: Hash mismatch at block %s (Tampering suspected). Stored %s, recalculated %s.",
+                                position, block.hash, calculated_hash)
+            # The exact hash input can be as large as the block, so only at DEBUG
+            if validation_log.isEnabledFor(logging.DEBUG):
+                validation_log.debug("Block %s hash input: %s", position, block.hash_input().decode('utf-8'))
+            return False
+
+        # Check Proof of Work
+        block_target = "0" * block.difficulty
+        if block.hash[:block.difficulty] != block_target:
+            validation_log.info("Validation error: Proof of Work invalid at block %s (hash %s, difficulty %s).",
+                                position, block.hash, block.difficulty)
+            return False
+        return True
 
-    # --- Static Validation Method (with DETAILED logging) ---
     @staticmethod
-    def validate_chain_structure(chain_to_validate):
-        """Validates the structure, hashes, links, and PoW of a given list of Block objects."""
+    def validate_chain_structure(chain_to_validate, start_index=0):
+        """
+        Validates the structure, hashes, links, and PoW of a given list of Block objects.
+        Blocks before start_index are taken as already verified (see validation.ChainValidator);
+        the block at start_index is still checked against its predecessor.
+        """
         if not chain_to_validate:
-            print("Validation Warning: Chain to validate is empty.")
+            validation_log.warning("Chain to validate is empty.")
             return {'is_valid': True, 'first_invalid_index': None}
 
-        # Helper to generate the string exactly as calculate_hash does
-        def get_hash_input_string(block):
-             content = {
-                "index": block.index, "timestamp": block.timestamp, "data": block.data,
-                "previous_hash": block.previous_hash, "difficulty": block.difficulty, "nonce": block.nonce
-             }
-             return json.dumps(content, sort_keys=True, separators=(',', ':'))
+        started = perf_counter()
+        # Checked once so the per-block detail below costs nothing unless DEBUG is on
+        debug = validation_log.isEnabledFor(logging.DEBUG)
 
+        def finish(first_invalid_index):
+            blocks_checked = len(chain_to_validate) - start_index
+            elapsed = perf_counter() - started
+            if blocks_checked > 0:
+                REGISTRY.histogram('validation_seconds_per_block').observe(elapsed / blocks_checked)
+            if first_invalid_index is None:
+                validation_log.info("Validation successful for chain of length %s (%s blocks rehashed in %.3fs).",
+                                    len(chain_to_validate), blocks_checked, elapsed)
+            return {'is_valid': first_invalid_index is None, 'first_invalid_index': first_invalid_index}
 
         # 1. Validate Genesis Block
-        genesis = chain_to_validate[0]
-        print(f"\n--- Validating Genesis Block (Index {genesis.index}) ---")
-        if genesis.index != 0:
-             print(f"!!! Validation Error: Genesis block index is not 0 (found {genesis.index}).")
-             return {'is_valid': False, 'first_invalid_index': 0}
-
-        genesis_recalculated_hash = genesis.calculate_hash()
-        print(f"  Stored Hash:       {genesis.hash}")
-        print(f"  Recalculated Hash: {genesis_recalculated_hash}")
-        if genesis.hash != genesis_recalculated_hash:
-            print(f"!!! Validation Error: Genesis hash mismatch!")
-            print(f"    Input string for recalc: {get_hash_input_string(genesis)}") # Log exact input string
-            return {'is_valid': False, 'first_invalid_index': 0}
-
-        genesis_target = "0" * genesis.difficulty
-        print(f"  PoW Check: Hash starts with '{genesis.hash[:genesis.difficulty]}', Target prefix: '{genesis_target}' (Difficulty: {genesis.difficulty})")
-        if genesis.hash[:genesis.difficulty] != genesis_target:
-             print(f"!!! Validation Error: Genesis Proof of Work invalid!")
-             return {'is_valid': False, 'first_invalid_index': 0}
-        print("-" * 20)
-
+        if start_index == 0:
+            if not Blockchain.check_block(chain_to_validate[0], None, 0, debug):
+                return finish(0)
+        elif debug:
+            validation_log.debug("Blocks 0..%s already verified, validating from block %s", start_index - 1, start_index)
 
         # 2. Validate subsequent blocks
-        for i in range(1, len(chain_to_validate)):
-            current_block = chain_to_validate[i]
-            previous_block = chain_to_validate[i-1]
-            print(f"--- Validating Block #{current_block.index} ---")
+        for i in range(max(1, start_index), len(chain_to_validate)):
+            if not Blockchain.check_block(chain_to_validate[i], chain_to_validate[i-1], i, debug):
+                return finish(i)
 
-            # Check index order
-            if current_block.index != previous_block.index + 1:
-                 print(f"!!! Validation Error: Index mismatch at block {i}. Expected {previous_block.index + 1}, got {current_block.index}.")
-                 return {'is_valid': False, 'first_invalid_index': i}
-
-            # Check previous hash link
-            if current_block.previous_hash != previous_block.hash:
-                print(f"!!! Validation Error: Previous hash link broken at block {i}.")
-                print(f"    Block {i} previous_hash: {current_block.previous_hash}")
-                print(f"    Block {i-1} hash:        {previous_block.hash}")
-                return {'is_valid': False, 'first_invalid_index': i}
-
-            # Check hash recalculation (Tampering check)
-            calculated_hash = current_block.calculate_hash()
-            print(f"  Stored Hash:       {current_block.hash}")
-            print(f"  Recalculated Hash: {calculated_hash}")
-            if current_block.hash != calculated_hash:
-                print(f"!!! Validation Error: Hash mismatch at block {i} (Tampering suspected).")
-                print(f"    Input string for recalc: {get_hash_input_string(current_block)}") # Log exact input string
-                # Further log individual components if needed:
-                # print(f"      index={current_block.index}, type={type(current_block.index)}")
-                # print(f"      timestamp='{current_block.timestamp}', type={type(current_block.timestamp)}")
-                # print(f"      data={current_block.data}, type={type(current_block.data)}")
-                # print(f"      previous_hash='{current_block.previous_hash}', type={type(current_block.previous_hash)}")
-                # print(f"      difficulty={current_block.difficulty}, type={type(current_block.difficulty)}")
-                # print(f"      nonce={current_block.nonce}, type={type(current_block.nonce)}")
-                return {'is_valid': False, 'first_invalid_index': i}
-
-            # Check Proof of Work
-            block_target = "0" * current_block.difficulty
-            print(f"  PoW Check: Hash starts with '{current_block.hash[:current_block.difficulty]}', Target prefix: '{block_target}' (Difficulty: {current_block.difficulty})")
-            if current_block.hash[:current_block.difficulty] != block_target:
-                print(f"!!! Validation Error: Proof of Work invalid at block {i}.")
-                return {'is_valid': False, 'first_invalid_index': i}
-            print("-" * 20)
-
-
-        print(f"\nValidation successful for chain of length {len(chain_to_validate)}.")
-        return {'is_valid': True, 'first_invalid_index': None}
\ No newline at end of file
+        return finish(None)
@@ -0,0 +1,94 @@
+# --- chain_cli.py (Bulk Chain Export / Import) ---
+# Usage:
+#   python chain_cli.py export [--data-dir DIR] [--format binary|ndjson] [-o FILE]
+#   python chain_cli.py import [--data-dir DIR] FILE
+# Works on a block store directory (see CHAIN_DATA_DIR); stop the node before importing into its store.
+import argparse
+import os
+import sys
+
+from blockchain import Blockchain
+from block_codec import encode_chain, decode_chain
+from block_store import BlockStore, block_to_record
+from node_logging import configure_logging, get_logger
+
+log = get_logger('chain')
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chain_data')
+
+
+def export_chain(store, output, fmt='binary'):
+    """Writes every block of the store to `output` (a binary file object). Returns the block count."""
+    blocks = (store.get_block(height) for height in range(len(store)))
+    if fmt == 'binary':
+        for piece in encode_chain(blocks):
+            output.write(piece)
+    else:
+        # Same fields as the store records (to_dict + mined_timestamp), one block per line
+        for block in blocks:
+            output.write(block_to_record(block) + b'\n')
+    return len(store)
+
+
+def import_chain(store, source):
+    """
+    Appends a binary chain stream to an empty store, checking every block against the
+    previous one as it is read. Raises ValueError (and leaves the store empty) if a block
+    is invalid or the stream is malformed. Returns the block count.
+    """
+    if len(store):
+        raise ValueError(f"Block store {store.directory} already holds {len(store)} blocks; import needs an empty store.")
+    previous_block = None
+    try:
+        for position, block in enumerate(decode_chain(source)):
+            if not Blockchain.check_block(block, previous_block, position):
+                raise ValueError(f"Block at index {position} is invalid.")
+            store.append(block)
+            previous_block = block
+    except ValueError:
+        store.truncate(0)
+        raise
+    store.sync()
+    return len(store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk export / import of a block store")
+    parser.add_argument('--data-dir', default=os.environ.get('CHAIN_DATA_DIR') or DEFAULT_DATA_DIR,
+                        help="Block store directory (default: CHAIN_DATA_DIR or backend/chain_data)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="Write the chain to a file (or stdout)")
+    export_parser.add_argument('--format', choices=('binary', 'ndjson'), default='binary')
+    export_parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    import_parser = commands.add_parser('import', help="Load a binary chain file into an empty store")
+    import_parser.add_argument('input', help="Binary chain file ('-' for stdin)")
+    args = parser.parse_args()
+    configure_logging()
+
+    store = BlockStore(args.data_dir)
+    try:
+        if args.command == 'export':
+            if args.output:
+                with open(args.output, 'wb') as output:
+                    count = export_chain(store, output, args.format)
+            else:
+                count = export_chain(store, sys.stdout.buffer, args.format)
+            log.info("Exported %s blocks from %s", count, args.data_dir)
+        else:
+            try:
+                if args.input == '-':
+                    count = import_chain(store, sys.stdin.buffer)
+                else:
+                    with open(args.input, 'rb') as source:
+                        count = import_chain(store, source)
+            except ValueError as e:
+                log.error("Import failed: %s", e)
+                return 1
+            log.info("Imported %s blocks into %s", count, args.data_dir)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# --- columnar_chain.py (Columnar In-memory Chain) ---
+from array import array
+from datetime import datetime, timedelta
+
+HASH_SIZE = 32
+NO_MERKLE_ROOT = bytes(HASH_SIZE) # Placeholder in the Merkle root column for version 1 blocks
+# Block timestamps are naive local times formatted like this (see Blockchain.prepare_block)
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_timestamp(timestamp):
+    """Microseconds since EPOCH if the string round-trips exactly through the node's format, else None."""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat(sep=' ', timespec='microseconds') != timestamp:
+        return None
+    micros = (parsed - EPOCH) // ONE_MICROSECOND
+    return micros if micros >= 0 else None # Negative values mark odd timestamps in the column
+
+
+def decode_timestamp(micros):
+    return (EPOCH + micros * ONE_MICROSECOND).isoformat(sep=' ', timespec='microseconds')
+
+
+class ColumnarChain:
+    """
+    List-like chain (the same interface as PersistentChain) that keeps block headers in
+    parallel typed columns instead of one Block object per height:
+
+    hashes, merkle roots   one bytearray each, 32 bytes per block
+    previous hashes        not stored: block N's is block N-1's hash (checked on append)
+    timestamps             int64 microseconds (odd strings that don't round-trip are kept aside)
+    version, difficulty    uint8
+    nonce                  uint64
+    mined timestamp        float64
+
+    That is about 100 bytes per header. Block objects are rebuilt on access, so blocks read
+    from the chain are copies: changing one doesn't change the chain. Transaction data is
+    kept by reference; header-only blocks (data None) are supported for light chains.
+    """
+
+    def __init__(self):
+        self._hashes = bytearray()
+        self._merkle_roots = bytearray()
+        self._timestamps = array('q')
+        self._odd_timestamps = {} # height -> timestamp string
+        self._versions = array('B')
+        self._difficulties = array('B')
+        self._nonces = array('Q')
+        self._mined_timestamps = array('d')
+        self._data = []
+        self._genesis_previous_hash = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def __bool__(self):
+        return len(self._data) > 0
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        length = len(self._data)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("chain index out of range")
+        return self._block(position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._block(position)
+
+    def _hash_at(self, position):
+        return self._hashes[position * HASH_SIZE:(position + 1) * HASH_SIZE]
+
+    def _block(self, position):
+        from blockchain import Block # Imported here: blockchain.py imports this module
+        merkle_root = self._merkle_roots[position * HASH_SIZE:(position + 1) * HASH_SIZE]
+        micros = self._timestamps[position]
+        return Block(
+            index=position,
+            timestamp_str=self._odd_timestamps[position] if micros < 0 else decode_timestamp(micros),
+            data=self._data[position],
+            previous_hash=self._genesis_previous_hash if position == 0 else self._hash_at(position - 1).hex(),
+            difficulty=self._difficulties[position],
+            nonce=self._nonces[position],
+            hash_val=self._hash_at(position).hex(),
+            mined_timestamp=self._mined_timestamps[position],
+            version=self._versions[position],
+            merkle_root=merkle_root.hex() if merkle_root != NO_MERKLE_ROOT else None
+        )
+
+    def append(self, block):
+        """Appends the next block; it must link to the current tip and carry canonical SHA-256 hashes."""
+        position = len(self._data)
+        if block.index != position:
+            raise ValueError(f"Columnar chain expects height {position}, got block #{block.index}")
+        if position > 0 and block.previous_hash != self._hash_at(position - 1).hex():
+            raise ValueError(f"Block #{block.index} does not link to the chain tip")
+        try:
+            block_hash = bytes.fromhex(block.hash)
+            merkle_root = bytes.fromhex(block.merkle_root) if block.merkle_root is not None else NO_MERKLE_ROOT
+        except ValueError:
+            block_hash = merkle_root = b''
+        if len(block_hash) != HASH_SIZE or len(merkle_root) != HASH_SIZE:
+            raise ValueError(f"Block #{block.index} has no canonical SHA-256 hash / Merkle root")
+        micros = encode_timestamp(block.timestamp)
+
+        # Fill the typed columns first: they are the ones that can reject a value (OverflowError)
+        try:
+            self._versions.append(block.version)
+            self._difficulties.append(block.difficulty)
+            self._nonces.append(block.nonce)
+            self._mined_timestamps.append(block.mined_timestamp)
+            self._timestamps.append(micros if micros is not None else -1)
+        except (OverflowError, TypeError) as e:
+            self._truncate_columns(position)
+            raise ValueError(f"Block #{block.index} doesn't fit the columnar layout: {e}") from e
+        if micros is None:
+            self._odd_timestamps[position] = block.timestamp
+        if position == 0:
+            self._genesis_previous_hash = block.previous_hash
+        self._hashes += block_hash
+        self._merkle_roots += merkle_root
+        self._data.append(block.data)
+
+    def _truncate_columns(self, length):
+        for column in (self._versions, self._difficulties, self._nonces, self._mined_timestamps, self._timestamps):
+            del column[length:]
+
+    def truncate(self, length):
+        """Drops every block at height >= length."""
+        if length >= len(self._data):
+            return
+        self._truncate_columns(length)
+        del self._hashes[length * HASH_SIZE:]
+        del self._merkle_roots[length * HASH_SIZE:]
+        del self._data[length:]
+        for position in [p for p in self._odd_timestamps if p >= length]:
+            del self._odd_timestamps[position]
@@ -0,0 +1,149 @@
+# --- difficulty_sim.py (Fast-forward Difficulty Retargeting Simulation) ---
+# Drives a real Blockchain (prepare_block / adjust_difficulty / commit_block) with a fake clock
+# and sampled solve times instead of proof-of-work.
+# Usage: python difficulty_sim.py [--blocks 20000] [--hash-rate 1e6] [--hash-rate-change 50000:4e6]
+#                                 [--interval 10] [--adjustment-interval 5] [--csv series.csv]
+import argparse
+import csv
+import random
+import sys
+from time import perf_counter
+
+from blockchain import Blockchain, block_work, BLOCK_GENERATION_INTERVAL, DIFFICULTY_ADJUSTMENT_INTERVAL
+from node_logging import configure_logging
+
+# Simulated time starts here (Unix seconds), so block timestamps look like real ones
+SIMULATION_EPOCH = 1_735_689_600.0
+
+
+class SimulatedClock:
+    """Stands in for time.time(); only moves when advance() is called."""
+
+    def __init__(self, start=SIMULATION_EPOCH):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class HashRateModel:
+    """
+    Network hash rate (hashes per second) with optional step changes at given simulated
+    times. Mining a block is a Poisson process: each hash succeeds with probability
+    1 / block_work(difficulty), so the solve time is exponential with mean
+    block_work(difficulty) / hash_rate.
+    """
+
+    def __init__(self, hash_rate, changes=(), seed=None):
+        self.hash_rate = hash_rate
+        self.changes = sorted(changes) # [(seconds since start, new hash rate), ...]
+        self.rng = random.Random(seed)
+
+    def rate_at(self, elapsed):
+        rate = self.hash_rate
+        for at, new_rate in self.changes:
+            if elapsed < at:
+                break
+            rate = new_rate
+        return rate
+
+    def solve_time(self, difficulty, elapsed):
+        return self.rng.expovariate(self.rate_at(elapsed) / block_work(difficulty))
+
+
+def simulate(blocks, model, initial_difficulty=4, block_generation_interval=None,
+             difficulty_adjustment_interval=None, clock=None):
+    """
+    Mines `blocks` empty blocks on a fresh Blockchain using sampled solve times and returns
+    the time series as a list of {index, time, block_time, difficulty, hash_rate} dicts
+    (time in simulated seconds since the genesis block).
+    """
+    clock = clock or SimulatedClock()
+    # The genesis block is mined for real at difficulty 1 (a few hashes); simulation starts after it
+    blockchain = Blockchain(initial_difficulty=1, clock=clock,
+                            block_generation_interval=block_generation_interval,
+                            difficulty_adjustment_interval=difficulty_adjustment_interval)
+    blockchain.difficulty = initial_difficulty
+    start = clock()
+    series = []
+    for _ in range(blocks):
+        block = blockchain.prepare_block([]) # Runs adjust_difficulty() against the simulated timestamps
+        elapsed = clock() - start
+        solve_time = model.solve_time(block.difficulty, elapsed)
+        clock.advance(solve_time)
+        # No PoW: the block keeps nonce 0 and the hash computed when it was built
+        blockchain.commit_block(block, block.hash)
+        series.append({
+            'index': block.index,
+            'time': clock() - start,
+            'block_time': solve_time,
+            'difficulty': block.difficulty,
+            'hash_rate': model.rate_at(elapsed)
+        })
+    return series
+
+
+def summarize(series, window):
+    """Mean block time and difficulty range for each run of `window` blocks."""
+    rows = []
+    for first in range(0, len(series), window):
+        chunk = series[first:first + window]
+        difficulties = [point['difficulty'] for point in chunk]
+        rows.append((chunk[0]['index'], chunk[-1]['index'], sum(point['block_time'] for point in chunk) / len(chunk),
+                     min(difficulties), max(difficulties), chunk[-1]['hash_rate']))
+    return rows
+
+
+def parse_change(value):
+    at, _, rate = value.partition(':')
+    return float(at), float(rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-forward difficulty retargeting simulation")
+    parser.add_argument('--blocks', type=int, default=20000)
+    parser.add_argument('--hash-rate', type=float, default=1e6, help="Network hashes per second")
+    parser.add_argument('--hash-rate-change', type=parse_change, action='append', default=[], metavar='SECONDS:RATE',
+                        help="Switch to RATE hashes/s after SECONDS of simulated time (repeatable)")
+    parser.add_argument('--initial-difficulty', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=BLOCK_GENERATION_INTERVAL,
+                        help="Target seconds per block (BLOCK_GENERATION_INTERVAL)")
+    parser.add_argument('--adjustment-interval', type=int, default=DIFFICULTY_ADJUSTMENT_INTERVAL,
+                        help="Blocks between retargets (DIFFICULTY_ADJUSTMENT_INTERVAL)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--window', type=int, default=None, help="Blocks per summary row (default: blocks / 20)")
+    parser.add_argument('--csv', help="Write the per-block time series to this CSV file ('-' for stdout)")
+    args = parser.parse_args()
+    # Per-block INFO logs would dominate the run time
+    configure_logging(default_level='WARNING')
+
+    model = HashRateModel(args.hash_rate, args.hash_rate_change, args.seed)
+    started = perf_counter()
+    series = simulate(args.blocks, model, args.initial_difficulty, args.interval, args.adjustment_interval)
+    elapsed = perf_counter() - started
+
+    if args.csv:
+        output = sys.stdout if args.csv == '-' else open(args.csv, 'w', newline='')
+        try:
+            writer = csv.DictWriter(output, fieldnames=['index', 'time', 'block_time', 'difficulty', 'hash_rate'])
+            writer.writeheader()
+            writer.writerows(series)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if args.csv == '-':
+            return
+
+    print(f"{args.blocks} blocks simulated in {elapsed:.2f}s ({args.blocks / elapsed:,.0f} blocks/s), "
+          f"{series[-1]['time'] / 3600:.1f}h of simulated time, target {args.interval}s/block")
+    print(f"{'blocks':>15} {'mean block s':>13} {'difficulty':>11} {'hash rate':>11}")
+    for first, last, mean_time, low, high, rate in summarize(series, args.window or max(1, args.blocks // 20)):
+        difficulty = str(low) if low == high else f"{low}-{high}"
+        print(f"{first:>7}-{last:<7} {mean_time:>13.2f} {difficulty:>11} {rate:>11.3g}")
+
+
+if __name__ == '__main__':
+    main()
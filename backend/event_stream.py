@@ -0,0 +1,152 @@
+# --- event_stream.py (Server-Sent Events Broadcasting) ---
+import json
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+
+# Published events kept for resuming clients (and for subscribers that fall behind)
+EVENT_BUFFER_SIZE = 1000
+# Seconds of silence before a keep-alive comment is sent (also how often a subscriber notices shutdown)
+HEARTBEAT_SECONDS = 15
+# Reconnect delay the browser is told to use (milliseconds)
+RETRY_MS = 3000
+
+HEARTBEAT = b': keep-alive\n\n'
+RETRY = f'retry: {RETRY_MS}\n\n'.encode('ascii')
+
+_encode_json = json.JSONEncoder(separators=(',', ':')).encode
+
+
+class Event:
+    """One published event. `encoded` is the complete SSE frame, built once and sent to every subscriber."""
+
+    __slots__ = ('seq', 'type', 'tip', 'sets_tip', 'encoded')
+
+    def __init__(self, seq, event_id, event_type, data, tip, sets_tip=False):
+        self.seq = seq
+        self.type = event_type
+        self.tip = tip # (index, hash) of the chain tip once this event has been applied
+        self.sets_tip = sets_tip # True for events that changed the chain
+        self.encoded = f'id: {event_id}\nevent: {event_type}\ndata: {_encode_json(data)}\n\n'.encode('utf-8')
+
+
+class EventBroadcaster:
+    """
+    Fans events out to any number of Server-Sent Events subscribers.
+
+    publish() serializes an event once into a bounded buffer; every subscriber is a
+    generator reading the same buffer, so a new block costs one JSON encoding however many
+    clients are connected, and a slow client only holds a position, not a queue.
+
+    Event ids are "<stream>-<seq>", the stream part changing on every restart. A client
+    resumes either with the id of the last event it saw (the Last-Event-ID header browsers
+    send when reconnecting) or with the chain tip it has (since_index / since_hash). When
+    the buffer no longer reaches back that far, or the id belongs to another run, the
+    client gets a `resync` event telling it to refetch, then live events.
+
+    Events that change the chain pass the new tip to publish(); the others inherit the
+    current one, so each buffered event knows which tip it follows.
+    """
+
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE, heartbeat=HEARTBEAT_SECONDS):
+        self.heartbeat = heartbeat
+        self.stream_id = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=buffer_size)
+        self._seq = 0 # seq of the last published event
+        self._tip = None
+        self._start_tip = None # Tip before the first event
+        self._subscribers = 0
+        self._closed = False
+        self._changed = threading.Condition()
+
+    @property
+    def subscriber_count(self):
+        return self._subscribers
+
+    def set_tip(self, index, block_hash):
+        """Sets the chain tip that following events are tagged with (call once at startup)."""
+        with self._changed:
+            self._tip = self._start_tip = (index, block_hash)
+
+    def publish(self, event_type, data, tip=None):
+        """Serializes and buffers an event, waking all subscribers. `tip` is the new (index, hash) for chain events."""
+        with self._changed:
+            if tip is not None:
+                self._tip = tip
+            self._seq += 1
+            self._events.append(Event(self._seq, f'{self.stream_id}-{self._seq}', event_type, data, self._tip,
+                                      sets_tip=tip is not None))
+            self._changed.notify_all()
+
+    def close(self):
+        """Ends every subscription (at its next wake-up)."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def _resync_frame(self):
+        data = {'tip_index': self._tip[0], 'tip_hash': self._tip[1]} if self._tip else {}
+        # The id lets a browser that reconnects after this resume from here
+        return Event(self._seq, f'{self.stream_id}-{self._seq}', 'resync', data, self._tip).encoded
+
+    def _start_after(self, last_event_id, since_index, since_hash):
+        """
+        Seq to resume after, or None if the client has to resync. Called with the lock held.
+        """
+        if last_event_id is not None:
+            stream, _, seq = last_event_id.partition('-')
+            if stream != self.stream_id or not seq.isdigit() or int(seq) > self._seq:
+                return None
+            seq = int(seq)
+            oldest = self._events[0].seq if self._events else self._seq + 1
+            return seq if seq >= oldest - 1 else None
+        if since_index is None:
+            return self._seq
+        def matches(tip):
+            return tip is not None and tip[0] == since_index and (since_hash is None or tip[1] == since_hash)
+
+        # After the event that made the client's block the tip; all later ones are still to come
+        for event in self._events:
+            if event.sets_tip and matches(event.tip):
+                return event.seq
+        # The startup tip, as long as no event has been dropped since
+        if (not self._events or self._events[0].seq == 1) and matches(self._start_tip):
+            return 0
+        return None
+
+    def subscribe(self, last_event_id=None, since_index=None, since_hash=None):
+        """
+        Generator of SSE frames (bytes) for one client: the retry hint, buffered events it
+        missed (or a resync event), then live events and keep-alive comments until close()
+        or until the generator is closed (client disconnected).
+        """
+        with self._changed:
+            self._subscribers += 1
+            after = self._start_after(last_event_id, since_index, since_hash)
+            first = [RETRY] if after is not None else [RETRY, self._resync_frame()]
+            if after is None:
+                after = self._seq
+        try:
+            yield b''.join(first)
+            while True:
+                with self._changed:
+                    if after == self._seq and not self._closed:
+                        self._changed.wait(self.heartbeat)
+                    if self._closed:
+                        return
+                    if after == self._seq:
+                        frames = [HEARTBEAT]
+                    elif not self._events or self._events[0].seq > after + 1:
+                        # Fell behind by more than the buffer holds
+                        frames = [self._resync_frame()]
+                        after = self._seq
+                    else:
+                        start = after + 1 - self._events[0].seq
+                        frames = [event.encoded for event in islice(self._events, start, None)]
+                        after = self._seq
+                # Written outside the lock so a slow client never blocks publishers
+                yield b''.join(frames)
+        finally:
+            with self._changed:
+                self._subscribers -= 1
@@ -0,0 +1,200 @@
+# --- mempool.py (Fee-prioritized, Bounded Mempool) ---
+import hashlib
+import json
+import math
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+# --- Configuration ---
+MAX_MEMPOOL_TRANSACTIONS = 10000
+MAX_MEMPOOL_BYTES = 5_000_000
+MAX_BLOCK_TRANSACTIONS = 500
+MAX_BLOCK_BYTES = 250_000
+
+
+class DuplicateTransactionError(ValueError):
+    """The transaction (same id) is already waiting in the mempool."""
+
+
+class MempoolFullError(ValueError):
+    """The mempool is at capacity and the transaction doesn't outbid anything in it."""
+
+
+def canonical_transaction(transaction):
+    """Canonical JSON encoding (same settings as block hashing) used for ids and sizes."""
+    return json.dumps(transaction, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def transaction_id(transaction):
+    """Content-derived id: the SHA-256 of the canonical encoding."""
+    return hashlib.sha256(canonical_transaction(transaction)).hexdigest()
+
+
+def transaction_fee(transaction):
+    """Fee as a float for ordering (transactions store amounts as strings); missing/invalid fees count as 0."""
+    try:
+        fee = float(transaction.get('fee', 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return fee if math.isfinite(fee) else 0.0
+
+
+class Mempool:
+    """
+    Pending transactions, ordered by fee.
+
+    - Duplicates are rejected in O(1) through a dict keyed by transaction id.
+    - A sorted index of (fee, -arrival, txid) keys gives the best transaction at the end
+      and the eviction candidate at the front; equal fees are served first-come-first-served.
+    - Count and byte caps are enforced by evicting the lowest-priority transactions; a new
+      transaction that would itself be the one evicted is rejected with MempoolFullError.
+    - select_for_block() hands out the best transactions that fit the block limits and
+      leaves the rest queued. Their arrival order is remembered (for the last
+      max_transactions handed out), so requeue() puts them back in their old place.
+    - Listeners added with add_listener() hear about every change, one call per operation.
+
+    All methods are thread-safe; hold `lock` to make several calls atomic.
+    """
+
+    def __init__(self, max_transactions=MAX_MEMPOOL_TRANSACTIONS, max_bytes=MAX_MEMPOOL_BYTES):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self._entries = {} # txid -> (sort key, transaction, size)
+        self._order = [] # Sorted sort keys, lowest priority first
+        self._bytes = 0
+        self._arrivals = 0
+        self._handed_out = OrderedDict() # txid -> arrival number of transactions select_for_block() returned
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, txid):
+        return txid in self._entries
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def add_listener(self, listener):
+        """
+        Registers listener(added, removed_txids), called with the lock held after each change:
+        `added` is a list of (txid, transaction), `removed_txids` the ids that left the mempool
+        (mined, evicted or dropped), applied in that order.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, added, removed_txids):
+        if added or removed_txids:
+            for listener in self._listeners:
+                listener(added, removed_txids)
+
+    def add(self, transaction):
+        """Adds a transaction and returns its id. Raises DuplicateTransactionError / MempoolFullError."""
+        with self.lock:
+            evicted = []
+            txid = self._add(transaction, evicted)
+            self._notify([(txid, transaction)], evicted)
+        return txid
+
+    def _add(self, transaction, evicted):
+        """add() without notifying; ids of transactions evicted to make room are appended to `evicted`."""
+        encoded = canonical_transaction(transaction)
+        txid = hashlib.sha256(encoded).hexdigest()
+        size = len(encoded)
+        with self.lock:
+            if txid in self._entries:
+                raise DuplicateTransactionError(f"Transaction {txid[:16]}... is already in the mempool.")
+            if size > self.max_bytes:
+                raise MempoolFullError(f"Transaction of {size} bytes exceeds the mempool size limit.")
+            # A transaction coming back from a mining job keeps its place among equal fees
+            arrival = self._handed_out.pop(txid, None)
+            if arrival is None:
+                self._arrivals += 1
+                arrival = self._arrivals
+            key = (transaction_fee(transaction), -arrival, txid)
+
+            # Work out how many lowest-priority transactions have to go to make room
+            count = len(self._entries) + 1
+            total_bytes = self._bytes + size
+            victims = 0
+            while count > self.max_transactions or total_bytes > self.max_bytes:
+                if victims >= len(self._order) or self._order[victims] > key:
+                    raise MempoolFullError("Mempool is full and the transaction's fee is too low to replace anything.")
+                count -= 1
+                total_bytes -= self._entries[self._order[victims][2]][2]
+                victims += 1
+            for victim in self._order[:victims]:
+                self._remove_key(victim)
+                evicted.append(victim[2])
+
+            self._entries[txid] = (key, transaction, size)
+            insort(self._order, key)
+            self._bytes += size
+        return txid
+
+    def _remove_key(self, key):
+        self._order.pop(bisect_left(self._order, key))
+        _, _, size = self._entries.pop(key[2])
+        self._bytes -= size
+
+    def remove(self, txids):
+        """Removes transactions by id (unknown ids are ignored)."""
+        with self.lock:
+            removed = []
+            for txid in txids:
+                entry = self._entries.get(txid)
+                if entry is not None:
+                    self._remove_key(entry[0])
+                    removed.append(txid)
+            self._notify([], removed)
+
+    def select_for_block(self, max_transactions=MAX_BLOCK_TRANSACTIONS, max_bytes=MAX_BLOCK_BYTES):
+        """
+        Removes and returns the highest-fee transactions that fit in one block (at most
+        max_transactions and max_bytes of canonical JSON). Transactions too big for the
+        remaining space are skipped, not dropped, and stay queued.
+        """
+        with self.lock:
+            selected = []
+            used_bytes = 0
+            for key in reversed(self._order):
+                if len(selected) >= max_transactions or used_bytes >= max_bytes:
+                    break
+                size = self._entries[key[2]][2]
+                if used_bytes + size > max_bytes:
+                    continue
+                selected.append(key)
+                used_bytes += size
+            transactions = [self._entries[key[2]][1] for key in selected]
+            for key in selected:
+                self._remove_key(key)
+                self._handed_out[key[2]] = -key[1]
+            while len(self._handed_out) > self.max_transactions:
+                self._handed_out.popitem(last=False)
+            self._notify([], [key[2] for key in selected])
+            return transactions
+
+    def requeue(self, transactions):
+        """
+        Puts transactions back (e.g. from a cancelled mining job); ones that no longer fit are
+        dropped. Transactions handed out by select_for_block() regain their arrival order.
+        """
+        with self.lock:
+            added, evicted = [], []
+            for transaction in transactions:
+                try:
+                    added.append((self._add(transaction, evicted), transaction))
+                except ValueError:
+                    pass
+            self._notify(added, evicted)
+
+    def transactions(self, limit=None, with_ids=False):
+        """Pending transactions, highest priority first (as (txid, transaction) pairs if with_ids)."""
+        with self.lock:
+            keys = self._order[::-1] if limit is None else self._order[:-limit - 1:-1]
+            if with_ids:
+                return [(key[2], self._entries[key[2]][1]) for key in keys]
+            return [self._entries[key[2]][1] for key in keys]
@@ -0,0 +1,63 @@
+# --- merkle.py (Merkle Roots and Inclusion Proofs over Block Transactions) ---
+import hashlib
+import json
+
+# Domain separation so a leaf can never be passed off as an inner node (RFC 6962 style)
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def leaf_hash(transaction):
+    """Hash of one transaction, from the same canonical JSON encoding used for block hashing."""
+    encoded = json.dumps(transaction, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(LEAF_PREFIX + encoded).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def _next_level(level):
+    # An odd node out is promoted unchanged (no duplication, so no two lists share a root)
+    paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(transactions):
+    """Hex Merkle root of a list of transactions (SHA-256 of nothing for an empty list)."""
+    level = [leaf_hash(tx) for tx in transactions]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0].hex()
+
+
+def merkle_proof(transactions, position):
+    """
+    Inclusion proof for transactions[position]: the sibling hashes from leaf to root as
+    [{"hash": hex, "side": "left" | "right"}, ...]. Levels where the node is promoted
+    without a sibling contribute nothing.
+    """
+    if not 0 <= position < len(transactions):
+        raise IndexError(f"Transaction position {position} out of range (block has {len(transactions)}).")
+    level = [leaf_hash(tx) for tx in transactions]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({'hash': level[sibling].hex(), 'side': 'left' if sibling < position else 'right'})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_merkle_proof(transaction, proof, root):
+    """Light-client check: does `proof` connect `transaction` to the hex Merkle `root`?"""
+    current = leaf_hash(transaction)
+    for step in proof:
+        sibling = bytes.fromhex(step['hash'])
+        current = node_hash(sibling, current) if step['side'] == 'left' else node_hash(current, sibling)
+    return current.hex() == root
@@ -0,0 +1,130 @@
+# --- metrics.py (In-process Counters, Gauges and Latency Histograms) ---
+import threading
+from bisect import bisect_left
+
+# Default histogram bucket upper bounds, in seconds (latencies from 100us to 5min)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Value that goes up and down. Pass `func` to compute the value when the snapshot is taken."""
+
+    def __init__(self, func=None):
+        self._value = 0
+        self._func = func
+
+    def set(self, value):
+        self._value = value
+
+    def snapshot(self):
+        return self._func() if self._func is not None else self._value
+
+
+class Histogram:
+    """Distribution of observed values, bucketed by upper bound."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1) # Last slot is +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[slot] += 1
+            self._count += 1
+            self._sum += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), self._counts):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            return {
+                'count': self._count,
+                'sum': self._sum,
+                'mean': self._sum / self._count if self._count else None,
+                'min': self._min,
+                'max': self._max,
+                'buckets': buckets
+            }
+
+
+class MetricsRegistry:
+    """
+    Named metrics, created on first use. Histograms may carry one label value
+    (e.g. the route) and are then reported as {name: {label: histogram}}.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.setdefault(name, Counter())
+
+    def gauge(self, name, func=None):
+        with self._lock:
+            gauge = self._gauges.get(name)
+            if gauge is None:
+                gauge = self._gauges[name] = Gauge(func)
+            elif func is not None:
+                gauge._func = func
+            return gauge
+
+    def histogram(self, name, label=None, buckets=DEFAULT_BUCKETS):
+        key = (name, label)
+        histogram = self._histograms.get(key) # Lock-free fast path for existing histograms
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+        histogram_snapshot = {}
+        for (name, label), histogram in histograms.items():
+            if label is None:
+                histogram_snapshot[name] = histogram.snapshot()
+            else:
+                histogram_snapshot.setdefault(name, {})[label] = histogram.snapshot()
+        return {
+            'counters': {name: counter.snapshot() for name, counter in counters.items()},
+            'gauges': {name: gauge.snapshot() for name, gauge in gauges.items()},
+            'histograms': histogram_snapshot
+        }
+
+
+# Process-wide registry used by the node
+REGISTRY = MetricsRegistry()
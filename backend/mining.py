@@ -0,0 +1,263 @@
+# --- mining.py (Midstate-cached Proof-of-Work Engine) ---
+import hashlib
+import multiprocessing
+import queue
+import threading
+from itertools import count
+from time import monotonic
+
+from node_logging import get_logger
+
+log = get_logger('mining')
+
+# Hex digests are 64 nibbles long, so that's the hardest target we can express
+MAX_DIFFICULTY = 64
+# How many nonces are tried between checks of the cancel flag / progress reports
+STOP_CHECK_INTERVAL = 4096
+
+
+class MiningCancelled(Exception):
+    """Raised when a nonce search is cancelled before a valid hash is found."""
+
+
+def pow_target(difficulty):
+    """
+    Converts a difficulty (number of leading hex zeros) into a 32-byte bound.
+    A digest meets the target iff digest < bound, which is exactly the same test as
+    hexdigest()[:difficulty] == "0" * difficulty, just without building the hex string.
+    Returns None for difficulty 0 (every hash is valid).
+    """
+    if not isinstance(difficulty, int) or difficulty < 0 or difficulty > MAX_DIFFICULTY:
+        raise ValueError(f"Difficulty must be an integer between 0 and {MAX_DIFFICULTY}, got {difficulty!r}.")
+    if difficulty == 0:
+        return None
+    return (16 ** (MAX_DIFFICULTY - difficulty)).to_bytes(32, 'big')
+
+
+class MidstateMiner:
+    """
+    Searches nonces for one block template.
+
+    The canonical hash input (see Block.hash_template) is split at the nonce:
+        prefix + str(nonce) + suffix
+    The prefix holds the whole (possibly huge) data list, so it is serialized and fed into
+    SHA-256 exactly once. Each attempt only copies that midstate and feeds the nonce digits
+    plus the short suffix, which gives byte-for-byte the same hash as Block.calculate_hash().
+    """
+
+    def __init__(self, prefix, suffix, difficulty):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.difficulty = difficulty
+        self.target = pow_target(difficulty)
+        self._midstate = hashlib.sha256(prefix)
+
+    def hash_nonce(self, nonce):
+        """Returns the hex hash for a single nonce (same result as Block.calculate_hash)."""
+        h = self._midstate.copy()
+        h.update(b'%d' % nonce)
+        h.update(self.suffix)
+        return h.hexdigest()
+
+    def search(self, start=0, stop=None, step=1):
+        """
+        Tries nonces start, start+step, ... (up to but excluding stop, or forever if stop is None).
+        Returns (nonce, hash_hex) for the first nonce meeting the target, or None if the range
+        was exhausted.
+        """
+        nonces = count(start, step) if stop is None else range(start, stop, step)
+        suffix = self.suffix
+        copy = self._midstate.copy
+        target = self.target
+
+        if target is None:
+            # Difficulty 0: the very first nonce wins
+            for nonce in nonces:
+                return nonce, self.hash_nonce(nonce)
+            return None
+
+        for nonce in nonces:
+            h = copy()
+            h.update(b'%d' % nonce)
+            h.update(suffix)
+            if h.digest() < target:
+                return nonce, h.hexdigest()
+        return None
+
+    def mine(self, cancel_event=None, progress=None):
+        """
+        Searches from nonce 0 until a valid hash is found, in batches of STOP_CHECK_INTERVAL.
+        After every batch progress(nonces_tried_in_batch) is called (if given) and
+        cancel_event is checked; MiningCancelled is raised once it is set.
+        """
+        if cancel_event is None and progress is None:
+            return self.search()
+        for batch_start in count(0, STOP_CHECK_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                raise MiningCancelled("Mining cancelled.")
+            found = self.search(batch_start, batch_start + STOP_CHECK_INTERVAL)
+            if progress is not None:
+                progress(STOP_CHECK_INTERVAL if found is None else found[0] - batch_start + 1)
+            if found is not None:
+                return found
+
+
+# --- Parallel nonce search ---
+# Nonces per task handed to a worker
+DEFAULT_CHUNK_SIZE = 1 << 16
+# Seconds to wait for the chunks still out once the search is over. A chunk whose worker
+# died never comes back; after this long the pool is terminated instead of waiting forever
+CHUNK_DRAIN_TIMEOUT = 10
+
+# Worker-side globals (set by the pool initializer, one copy per worker process)
+_worker_stop_event = None
+_worker_miner = None
+
+
+def _init_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+
+def _search_chunk(prefix, suffix, difficulty, start, stop):
+    """
+    Worker task: searches [start, stop) and bails out early once any worker has won.
+    Returns (start, found_or_None, nonces_tried).
+    """
+    global _worker_miner
+    miner = _worker_miner
+    # Reuse the midstate across chunks of the same block
+    if miner is None or miner.prefix != prefix or miner.suffix != suffix or miner.difficulty != difficulty:
+        miner = _worker_miner = MidstateMiner(prefix, suffix, difficulty)
+
+    for batch_start in range(start, stop, STOP_CHECK_INTERVAL):
+        if _worker_stop_event.is_set():
+            return start, None, batch_start - start
+        found = miner.search(batch_start, min(batch_start + STOP_CHECK_INTERVAL, stop))
+        if found is not None:
+            _worker_stop_event.set()
+            return start, found, found[0] - start + 1
+    return start, None, stop - start
+
+
+class ParallelMiner:
+    """
+    Multi-core nonce search on a process pool.
+
+    The nonce space is cut into consecutive chunks of `chunk_size` nonces that are handed
+    to the workers in order, keeping at most two chunks per worker in flight. The first
+    worker to find a valid hash sets a shared stop event so every other worker abandons
+    its chunk. mine() keeps the (nonce, hash) contract of MidstateMiner.search(), though with
+    several workers the winning nonce is not necessarily the lowest valid one.
+
+    As with validation.BatchValidator, call start() early, before the process starts other
+    threads: with the "fork" start method a worker forked from a multithreaded process can
+    inherit locks held by threads that don't exist in it. If chunks are lost (a worker
+    died) the pool is terminated, and the next mine() has to start a new one from
+    wherever it runs.
+    """
+
+    def __init__(self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, mp_context=None,
+                 drain_timeout=CHUNK_DRAIN_TIMEOUT):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.drain_timeout = drain_timeout
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._stop_event = None
+        self._pool = None
+        self._lock = threading.Lock() # One mine() at a time shares the pool and stop event
+
+    def start(self):
+        """Starts the worker pool now instead of on the first mine()."""
+        with self._lock:
+            self._ensure_pool()
+        return self
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._stop_event = self._ctx.Event()
+            self._pool = self._ctx.Pool(self.workers, initializer=_init_worker, initargs=(self._stop_event,))
+        return self._pool
+
+    def _terminate_pool(self):
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+
+    def mine(self, prefix, suffix, difficulty, cancel_event=None, progress=None):
+        """
+        Returns (nonce, hash_hex) for a nonce meeting the difficulty target.
+        progress(nonces_tried_in_chunk) is called as each chunk comes back. Raises
+        MiningCancelled if cancel_event (any object with is_set()) gets set before a nonce is found.
+        """
+        pow_target(difficulty) # Validate difficulty up front, not inside the workers
+        with self._lock:
+            return self._mine(prefix, suffix, difficulty, cancel_event, progress)
+
+    def _mine(self, prefix, suffix, difficulty, cancel_event, progress):
+        pool = self._ensure_pool()
+        self._stop_event.clear()
+        results = queue.Queue()
+        in_flight = 0
+        next_start = 0
+        found = None
+
+        def submit():
+            nonlocal in_flight, next_start
+            pool.apply_async(_search_chunk,
+                             (prefix, suffix, difficulty, next_start, next_start + self.chunk_size),
+                             callback=results.put, error_callback=results.put)
+            next_start += self.chunk_size
+            in_flight += 1
+
+        def collect(result):
+            nonlocal in_flight, found
+            in_flight -= 1
+            if isinstance(result, BaseException):
+                return result
+            _, chunk_found, tried = result
+            if progress is not None:
+                progress(tried)
+            # Keep the lowest winning nonce if two workers hit at the same time
+            if chunk_found is not None and (found is None or chunk_found[0] < found[0]):
+                found = chunk_found
+            return None
+
+        for _ in range(self.workers * 2):
+            submit()
+
+        try:
+            # Until a worker wins (it sets the stop event) or the search is cancelled
+            while in_flight and not self._stop_event.is_set():
+                if cancel_event is not None and cancel_event.is_set():
+                    self._stop_event.set()
+                    break
+                try:
+                    result = results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                error = collect(result)
+                if error is not None:
+                    raise error
+                if found is None and not self._stop_event.is_set():
+                    submit()
+        finally:
+            # Never leave stale chunks running into the next mine() call
+            self._stop_event.set()
+            deadline = monotonic() + self.drain_timeout
+            while in_flight:
+                try:
+                    collect(results.get(timeout=max(0, deadline - monotonic())))
+                except queue.Empty:
+                    log.error("%s mining chunks didn't come back within %ss (worker died?); terminating the pool",
+                              in_flight, self.drain_timeout)
+                    self._terminate_pool()
+                    break
+        if found is None:
+            raise MiningCancelled("Mining cancelled.")
+        return found
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._terminate_pool()
@@ -0,0 +1,161 @@
+# --- mining_jobs.py (Background Mining Jobs) ---
+import threading
+import uuid
+from collections import OrderedDict
+from time import time
+
+from mining import MiningCancelled
+from node_logging import get_logger
+
+log = get_logger('mining')
+
+# How many finished jobs are kept around for status queries
+MAX_FINISHED_JOBS = 50
+# Minimum seconds between on_update() calls for nonce progress (status changes are always reported)
+PROGRESS_UPDATE_INTERVAL = 0.5
+
+
+class MiningJob:
+    """One background attempt to mine a block from a batch of mempool transactions."""
+
+    def __init__(self, transactions):
+        self.id = uuid.uuid4().hex
+        self.transactions = transactions
+        self.status = 'queued' # queued -> running -> completed | cancelled | failed
+        self.created_at = time()
+        self.started_at = None
+        self.finished_at = None
+        self.nonces_tried = 0
+        self.difficulty = None
+        self.block = None
+        self.error = None
+        self.cancel_event = threading.Event()
+
+    def record_progress(self, nonces):
+        # Only the mining thread writes this; readers just need an approximate value
+        self.nonces_tried += nonces
+
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        """Status snapshot for the API."""
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time()) - self.started_at
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'transaction_count': len(self.transactions),
+            'difficulty': self.difficulty,
+            'nonces_tried': self.nonces_tried,
+            'hash_rate': self.nonces_tried / elapsed if elapsed > 0 else 0.0,
+            'elapsed': elapsed,
+            'block': self.block.to_dict() if self.block is not None else None,
+            'error': self.error
+        }
+
+
+class MiningJobManager:
+    """
+    Runs mining jobs on a background thread, one at a time.
+
+    The chain lock is only held while the block template is built and while the mined
+    block is appended, never during proof-of-work, so readers stay responsive.
+    Transactions of a cancelled or failed job are handed back through requeue().
+    on_update(job), if given, is called from the mining thread whenever a job changes
+    status and, at most every PROGRESS_UPDATE_INTERVAL seconds, as nonces are tried.
+    """
+
+    def __init__(self, blockchain, chain_lock, requeue, on_update=None):
+        self.blockchain = blockchain
+        self.chain_lock = chain_lock
+        self.requeue = requeue
+        self.on_update = on_update
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = None
+
+    def active_job(self):
+        with self._lock:
+            return self._active
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, transactions):
+        """Starts mining `transactions`. Returns None if another job is still running."""
+        with self._lock:
+            if self._active is not None:
+                return None
+            job = MiningJob(transactions)
+            self._active = job
+            self._jobs[job.id] = job
+            # Drop the oldest finished jobs
+            while len(self._jobs) > MAX_FINISHED_JOBS:
+                oldest_id = next(iter(self._jobs))
+                if oldest_id == job.id:
+                    break
+                del self._jobs[oldest_id]
+
+        threading.Thread(target=self._run, args=(job,), name=f"mining-{job.id[:8]}", daemon=True).start()
+        return job
+
+    def cancel(self, job_id):
+        """Requests cancellation. Returns the job (or None if unknown)."""
+        job = self.get(job_id)
+        if job is not None and job.is_active:
+            job.cancel_event.set()
+        return job
+
+    def _notify(self, job):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(job)
+        except Exception:
+            # A failing listener must not fail (and requeue) an already mined block
+            log.exception("on_update failed for mining job %s", job.id[:8])
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time()
+        last_update = job.started_at
+
+        def progress(nonces):
+            nonlocal last_update
+            job.record_progress(nonces)
+            now = time()
+            if now - last_update >= PROGRESS_UPDATE_INTERVAL:
+                last_update = now
+                self._notify(job)
+
+        try:
+            with self.chain_lock:
+                block = self.blockchain.prepare_block(job.transactions)
+            job.difficulty = block.difficulty
+            self._notify(job)
+
+            _, final_hash = self.blockchain.proof_of_work(block, job.cancel_event, progress)
+
+            with self.chain_lock:
+                job.block = self.blockchain.commit_block(block, final_hash)
+            job.status = 'completed'
+            log.info("Mining job %s mined block #%s after %s nonces", job.id[:8], block.index, job.nonces_tried)
+        except MiningCancelled:
+            job.status = 'cancelled'
+            self.requeue(job.transactions)
+            log.info("Mining job %s cancelled after %s nonces", job.id[:8], job.nonces_tried)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self.requeue(job.transactions)
+            log.exception("Error during mining job %s: %s", job.id[:8], e)
+        finally:
+            job.finished_at = time()
+            with self._lock:
+                self._active = None
+            self._notify(job)
@@ -0,0 +1,381 @@
+# --- network_sim.py (In-process Multi-node Network Simulation) ---
+import json
+import struct
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+from blockchain import Blockchain, Block, LEGACY_BLOCK_VERSION, block_work
+from block_codec import RECORD_LENGTH, encode_block, decode_block
+from mempool import Mempool, canonical_transaction, transaction_id
+from node_logging import get_logger
+
+log = get_logger('network')
+
+# Headers returned per getheaders request; a syncing node keeps asking until a batch comes back short
+MAX_HEADERS_PER_MESSAGE = 2000
+# Block bodies per getbodies request, and how many of those requests a syncing node keeps in flight
+BODY_BATCH_SIZE = 128
+MAX_PARALLEL_BODY_REQUESTS = 4
+# Locator entries and block references on the wire: height + raw 32-byte hash
+BLOCK_REF = struct.Struct('>Q32s')
+BODY_LENGTH = struct.Struct('>I')
+
+
+def encode_refs(blocks):
+    """(index, hash) references for blocks with canonical hashes, as sent in locators and body requests."""
+    return b''.join(BLOCK_REF.pack(block.index, bytes.fromhex(block.hash)) for block in blocks)
+
+
+def decode_refs(payload):
+    return [(index, block_hash.hex()) for index, block_hash in BLOCK_REF.iter_unpack(payload)]
+
+
+def encode_records(blocks):
+    return b''.join(RECORD_LENGTH.pack(len(record)) + record for record in map(encode_block, blocks))
+
+
+def decode_records(payload):
+    view = memoryview(payload)
+    blocks = []
+    offset = 0
+    while offset < len(view):
+        length = RECORD_LENGTH.unpack_from(view, offset)[0]
+        offset += RECORD_LENGTH.size
+        blocks.append(decode_block(bytes(view[offset:offset + length])))
+        offset += length
+    return blocks
+
+
+class NetworkStats:
+    """Messages and payload bytes per message kind, plus completed sync timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages = Counter()
+        self.bytes = Counter()
+        self.syncs = [] # (node name, blocks fetched, seconds)
+
+    def record(self, kind, size):
+        with self._lock:
+            self.messages[kind] += 1
+            self.bytes[kind] += size
+
+    def record_sync(self, node_name, blocks, seconds):
+        with self._lock:
+            self.syncs.append((node_name, blocks, seconds))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'messages': dict(self.messages),
+                'bytes': dict(self.bytes),
+                'total_bytes': sum(self.bytes.values()),
+                'syncs': list(self.syncs)
+            }
+
+
+class SimulatedNetwork:
+    """
+    Nodes in one process connected by simulated links. Every message is really encoded
+    and decoded (binary block records, canonical JSON transactions), so the byte counts in
+    `stats` are what the wire would carry. A link adds `latency` seconds plus size / `bandwidth`
+    (bytes per second, None = unlimited) per message.
+
+    Gossip (tx / block announcements) is queued and delivered by run(); requests made
+    during sync (getheaders / getbodies) are answered synchronously.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.stats = NetworkStats()
+        self.nodes = []
+        self._queue = deque()
+
+    def add_node(self, node):
+        self.nodes.append(node)
+        return node
+
+    def connect(self, node_a, node_b):
+        if node_b not in node_a.peers:
+            node_a.peers.append(node_b)
+            node_b.peers.append(node_a)
+
+    def connect_all(self):
+        for i, node_a in enumerate(self.nodes):
+            for node_b in self.nodes[i + 1:]:
+                self.connect(node_a, node_b)
+
+    def _transfer(self, kind, payload):
+        self.stats.record(kind, len(payload))
+        delay = self.latency + (len(payload) / self.bandwidth if self.bandwidth else 0.0)
+        if delay > 0:
+            sleep(delay)
+
+    def post(self, sender, recipient, kind, payload):
+        """Queues a gossip message for delivery by run()."""
+        self._queue.append((sender, recipient, kind, payload))
+
+    def request(self, sender, recipient, kind, payload):
+        """Sends a request and returns the encoded response."""
+        self._transfer(kind, payload)
+        response = recipient.handle_request(kind, payload)
+        self._transfer(kind + '_response', response)
+        return response
+
+    def run(self, max_messages=None):
+        """Delivers queued gossip (including messages queued while delivering) until none are left."""
+        delivered = 0
+        while self._queue and (max_messages is None or delivered < max_messages):
+            sender, recipient, kind, payload = self._queue.popleft()
+            self._transfer(kind, payload)
+            recipient.receive(kind, payload, sender)
+            delivered += 1
+        return delivered
+
+
+class Node:
+    """
+    One simulated peer: its own Blockchain and Mempool plus gossip and headers-first sync.
+
+    Fork choice is most cumulative work (sum of 16 ** difficulty over the blocks), compared
+    from the fork point; ties keep the chain the node already has.
+    """
+
+    def __init__(self, name, network, genesis_block, difficulty=1, block_version=None):
+        self.name = name
+        self.network = network
+        options = {} if block_version is None else {'block_version': block_version}
+        # Difficulty stays fixed: simulated blocks come far faster than BLOCK_GENERATION_INTERVAL
+        self.blockchain = Blockchain(initial_difficulty=difficulty, genesis_block=genesis_block,
+                                     difficulty_adjustment_interval=0, **options)
+        self.mempool = Mempool()
+        self.peers = []
+        # Guards blockchain and mempool; never held while waiting on a peer, so syncs can't deadlock
+        self.lock = threading.RLock()
+        self._seen = set() # Hashes of announced blocks and ids of gossiped transactions already handled
+        self.blockchain.add_replace_listener(self._reconcile_mempool)
+        network.add_node(self)
+
+    def __repr__(self):
+        return f"Node({self.name!r}, height={len(self.blockchain.chain) - 1})"
+
+    # --- Gossip ---
+    def broadcast(self, kind, payload, exclude=None):
+        for peer in self.peers:
+            if peer is not exclude:
+                self.network.post(self, peer, kind, payload)
+
+    def submit_transaction(self, transaction):
+        """Adds a local transaction to the mempool and gossips it. Returns its id."""
+        with self.lock:
+            txid = self.mempool.add(transaction)
+            self._seen.add(txid)
+        self.broadcast('tx', canonical_transaction(transaction))
+        return txid
+
+    def mine_block(self, announce=True):
+        """Mines the best mempool transactions into a block on our tip and (by default) announces it."""
+        with self.lock:
+            block = self.blockchain.add_block(self.mempool.select_for_block())
+            self._seen.add(block.hash)
+        if announce:
+            self.announce(block)
+        return block
+
+    def announce(self, block=None):
+        """Gossips a block (default: our tip) to every peer."""
+        with self.lock:
+            block = block or self.blockchain.get_latest_block()
+        self.broadcast('block', encode_block(block))
+
+    def receive(self, kind, payload, sender):
+        if kind == 'tx':
+            self._receive_transaction(json.loads(payload), sender)
+        elif kind == 'block':
+            self._receive_block(decode_block(payload), sender)
+        else:
+            log.warning("%s: unknown gossip message %r from %s", self.name, kind, sender.name)
+
+    def _receive_transaction(self, transaction, sender):
+        txid = transaction_id(transaction)
+        with self.lock:
+            if txid in self._seen:
+                return
+            self._seen.add(txid)
+            try:
+                self.mempool.add(transaction)
+            except ValueError:
+                return
+        self.broadcast('tx', canonical_transaction(transaction), exclude=sender)
+
+    def _receive_block(self, block, sender):
+        with self.lock:
+            if block.hash in self._seen:
+                return
+            self._seen.add(block.hash)
+            tip = self.blockchain.get_latest_block()
+            extends_tip = block.previous_hash == tip.hash
+            if extends_tip:
+                try:
+                    self.blockchain.accept_block(block)
+                except ValueError as e:
+                    log.info("%s: rejected block #%s from %s: %s", self.name, block.index, sender.name, e)
+                    return
+                self.mempool.remove(transaction_id(tx) for tx in block.data if isinstance(tx, dict))
+            elif block.index < tip.index:
+                return # Stale: a branch this far behind can't be heavier without us having seen it
+        # Unknown parent on a branch at least as high as ours: it may carry more work, so sync
+        if extends_tip or self.sync_from(sender):
+            self.broadcast('block', encode_block(block), exclude=sender)
+
+    def _reconcile_mempool(self, fork_height, removed_blocks, added_blocks):
+        included = {transaction_id(tx) for block in added_blocks for tx in block.data if isinstance(tx, dict)}
+        self.mempool.remove(included)
+        self.mempool.requeue([tx for block in removed_blocks for tx in block.data
+                              if isinstance(tx, dict) and 'from_addr' in tx and transaction_id(tx) not in included])
+
+    # --- Serving sync requests ---
+    def handle_request(self, kind, payload):
+        with self.lock:
+            if kind == 'getheaders':
+                return self._serve_headers(decode_refs(payload))
+            if kind == 'getbodies':
+                return self._serve_bodies(decode_refs(payload))
+        raise ValueError(f"Unknown request {kind!r}")
+
+    def _serve_headers(self, locator):
+        """Headers after the highest locator entry on our chain (nothing if none matches)."""
+        for index, block_hash in locator:
+            if self.blockchain.contains_block(index, block_hash):
+                chain = self.blockchain.chain
+                return encode_records(block.header_only() for block in chain[index + 1:index + 1 + MAX_HEADERS_PER_MESSAGE])
+        return b''
+
+    def _serve_bodies(self, refs):
+        """Each requested block's data as length-prefixed JSON; stops at the first block we don't have."""
+        parts = []
+        for index, block_hash in refs:
+            if not self.blockchain.contains_block(index, block_hash):
+                break
+            body = json.dumps(self.blockchain.chain[index].data, separators=(',', ':')).encode('utf-8')
+            parts.append(BODY_LENGTH.pack(len(body)) + body)
+        return b''.join(parts)
+
+    # --- Headers-first sync ---
+    def locator(self):
+        """(index, hash) of our tip, then going back 1, 2, 4, 8... blocks, always ending at genesis."""
+        chain = self.blockchain.chain
+        height = len(chain) - 1
+        step = 1
+        blocks = []
+        while height > 0:
+            blocks.append(chain[height])
+            height -= step
+            step *= 2
+        blocks.append(chain[0])
+        return blocks
+
+    @staticmethod
+    def check_header(header, previous_block, position):
+        """
+        Version 2 headers are fully checked (link, hash over the header, PoW). Version 1 hashes
+        cover the data, so their headers only get link and PoW-prefix checks here; the hash
+        itself is checked once the body arrives.
+        """
+        if header.version != LEGACY_BLOCK_VERSION:
+            return Blockchain.check_block(header, previous_block, position)
+        return (header.index == previous_block.index + 1 and header.previous_hash == previous_block.hash
+                and header.hash[:header.difficulty] == "0" * header.difficulty)
+
+    def sync_from(self, peer):
+        """
+        Headers-first sync: fetch and check the peer's headers past our common ancestor, and
+        if that branch has more cumulative work, fetch the bodies in parallel batches and
+        switch to it. Returns True if our chain changed.
+        """
+        started = perf_counter()
+        with self.lock:
+            locator = self.locator()
+
+        headers = []
+        while True:
+            batch = decode_records(self.network.request(self, peer, 'getheaders', encode_refs(locator)))
+            headers.extend(batch)
+            if len(batch) < MAX_HEADERS_PER_MESSAGE:
+                break
+            locator = batch[-1:]
+        if not headers:
+            return False
+
+        fork_height = headers[0].index
+        with self.lock:
+            if not 0 < fork_height <= len(self.blockchain.chain):
+                return False
+            previous_block = self.blockchain.chain[fork_height - 1]
+            our_work = self.blockchain.chain_work(fork_height)
+        for position, header in enumerate(headers, fork_height):
+            if not self.check_header(header, previous_block, position):
+                log.info("%s: invalid header #%s from %s, sync aborted", self.name, position, peer.name)
+                return False
+            previous_block = header
+        their_work = sum(block_work(header.difficulty) for header in headers)
+        if their_work <= our_work:
+            return False
+
+        # Bodies in batches, several requests in flight at once
+        batches = [headers[i:i + BODY_BATCH_SIZE] for i in range(0, len(headers), BODY_BATCH_SIZE)]
+        with ThreadPoolExecutor(MAX_PARALLEL_BODY_REQUESTS) as pool:
+            bodies = [body for batch_bodies in pool.map(lambda batch: self._fetch_bodies(peer, batch), batches)
+                      for body in batch_bodies]
+        if len(bodies) != len(headers):
+            log.info("%s: %s sent %s of %s block bodies, sync aborted", self.name, peer.name, len(bodies), len(headers))
+            return False
+        blocks = [Block(header.index, header.timestamp, data, header.previous_hash, header.difficulty, header.nonce,
+                        header.hash, header.mined_timestamp, header.version, header.merkle_root)
+                  for header, data in zip(headers, bodies)]
+
+        with self.lock:
+            # Our chain may have moved while we were downloading; redo the fork choice against it
+            chain = self.blockchain.chain
+            if fork_height > len(chain) or chain[fork_height - 1].hash != headers[0].previous_hash:
+                return False
+            if their_work <= self.blockchain.chain_work(fork_height):
+                return False
+            try:
+                # Rehashes every new block with its data, so a body that doesn't match its header fails here
+                self.blockchain.replace_suffix(fork_height, blocks)
+            except ValueError as e:
+                log.info("%s: blocks from %s rejected: %s", self.name, peer.name, e)
+                return False
+            self._seen.update(block.hash for block in blocks)
+
+        elapsed = perf_counter() - started
+        self.network.stats.record_sync(self.name, len(blocks), elapsed)
+        log.info("%s: synced %s blocks from %s (fork at %s) in %.3fs", self.name, len(blocks), peer.name, fork_height, elapsed)
+        return True
+
+    def _fetch_bodies(self, peer, headers):
+        payload = self.network.request(self, peer, 'getbodies', encode_refs(headers))
+        view = memoryview(payload)
+        bodies = []
+        offset = 0
+        while offset < len(view):
+            length = BODY_LENGTH.unpack_from(view, offset)[0]
+            offset += BODY_LENGTH.size
+            bodies.append(json.loads(str(view[offset:offset + length], 'utf-8')))
+            offset += length
+        return bodies
+
+
+def build_network(node_count, difficulty=1, latency=0.0, bandwidth=None, block_version=None):
+    """A fully connected network of `node_count` nodes sharing one freshly mined genesis block."""
+    options = {} if block_version is None else {'block_version': block_version}
+    genesis_block = Blockchain(initial_difficulty=difficulty, difficulty_adjustment_interval=0, **options).chain[0]
+    network = SimulatedNetwork(latency, bandwidth)
+    for i in range(node_count):
+        Node(f"node{i}", network, genesis_block, difficulty, block_version)
+    network.connect_all()
+    return network
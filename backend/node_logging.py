@@ -0,0 +1,42 @@
+# --- node_logging.py (Per-subsystem Logging Setup) ---
+import logging
+import os
+
+# Every logger lives under this prefix: blockchain.chain, blockchain.mining, ...
+LOGGER_PREFIX = 'blockchain'
+SUBSYSTEMS = ('chain', 'difficulty', 'mining', 'validation', 'network', 'api')
+DEFAULT_LEVEL = 'INFO'
+LOG_FORMAT = '%(asctime)s %(levelname)-7s [%(name)s] %(message)s'
+
+
+def get_logger(subsystem):
+    """Returns the logger for one subsystem (see SUBSYSTEMS)."""
+    return logging.getLogger(f"{LOGGER_PREFIX}.{subsystem}")
+
+
+def configure_logging(default_level=None, levels=None):
+    """
+    Sets up the handler and the per-subsystem levels.
+
+    default_level: level for all subsystems (env LOG_LEVEL, default INFO)
+    levels: overrides as "subsystem=LEVEL,..." (env LOG_LEVELS), e.g. "validation=DEBUG,api=WARNING"
+
+    Per-block validation details are only logged at DEBUG and are guarded by
+    isEnabledFor(), so leaving them disabled costs nothing on long chains.
+    """
+    default_level = (default_level or os.environ.get('LOG_LEVEL') or DEFAULT_LEVEL).upper()
+    levels = levels if levels is not None else os.environ.get('LOG_LEVELS', '')
+
+    root = logging.getLogger(LOGGER_PREFIX)
+    root.setLevel(default_level)
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+        root.propagate = False
+
+    for entry in filter(None, (part.strip() for part in levels.split(','))):
+        subsystem, _, level = entry.partition('=')
+        if subsystem.strip() not in SUBSYSTEMS or not level:
+            raise ValueError(f"Invalid log level override {entry!r} (subsystems: {', '.join(SUBSYSTEMS)})")
+        get_logger(subsystem.strip()).setLevel(level.strip().upper())
@@ -0,0 +1,41 @@
+# --- conftest.py (Shared Test Fixtures) ---
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (python app.py is run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Blockchain, MERKLE_BLOCK_VERSION # noqa: E402
+
+
+def transfer(from_addr, to_addr, amount, fee='0.0'):
+    return {'from_addr': from_addr, 'to_addr': to_addr, 'amount': str(amount), 'fee': fee}
+
+
+@pytest.fixture
+def make_blockchain():
+    """
+    Builds a Blockchain mined at difficulty 1 with retargeting off, so tests stay fast.
+    `blocks` is a list of transaction lists, one per block after genesis.
+    """
+    def make(blocks=(), **kwargs):
+        kwargs.setdefault('initial_difficulty', 1)
+        kwargs.setdefault('difficulty_adjustment_interval', 0)
+        blockchain = Blockchain(**kwargs)
+        for transactions in blocks:
+            blockchain.add_block(list(transactions))
+        return blockchain
+    return make
+
+
+@pytest.fixture
+def chain(request, make_blockchain):
+    """
+    The blocks of a freshly mined chain: genesis plus four blocks of one payment each.
+    Version 2 unless parametrized with indirect=True and a block version.
+    """
+    version = getattr(request, 'param', MERKLE_BLOCK_VERSION)
+    blockchain = make_blockchain([[transfer('alice', 'bob', i + 1)] for i in range(4)], block_version=version)
+    return list(blockchain.chain)
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from block_store import BlockStore
+from blockchain import Blockchain
+from conftest import transfer
+
+
+def balances(blockchain, *addresses):
+    index = blockchain.get_address_index()
+    return {address: Decimal(index.summary(address)['balance']) for address in addresses}
+
+
+def test_replace_chain_rolls_back_the_abandoned_branch(make_blockchain):
+    ours = make_blockchain([[transfer('alice', 'bob', 5, '1.0')], [transfer('bob', 'carol', 2)]])
+    theirs = make_blockchain([[transfer('alice', 'dave', 3)]] * 3, genesis_block=ours.chain[0])
+    assert balances(ours, 'alice', 'bob', 'carol') == {'alice': -6, 'bob': 3, 'carol': 2}
+
+    ours.replace_chain(list(theirs.chain))
+    index = ours.get_address_index()
+    assert index.height == len(ours.chain) == 4
+    assert 'bob' not in index and 'carol' not in index
+    assert balances(ours, 'alice', 'dave') == {'alice': -9, 'dave': 9}
+    assert [entry['block_index'] for entry in index.history('dave')] == [3, 2, 1]
+
+
+def test_reopened_store_is_indexed_on_first_query(tmp_path, make_blockchain):
+    blockchain = make_blockchain([[transfer('alice', 'bob', 1)], [transfer('bob', 'carol', 1)]],
+                                 store=BlockStore(str(tmp_path)))
+    blockchain.chain.store.close()
+
+    reopened = Blockchain(initial_difficulty=1, store=BlockStore(str(tmp_path)), difficulty_adjustment_interval=0)
+    assert reopened.address_index.height == 0 # Nothing decoded at startup
+    reopened.add_block([transfer('carol', 'dave', 1)]) # Appended while the index is behind
+    assert balances(reopened, 'bob', 'dave') == {'bob': 0, 'dave': 1}
+    assert reopened.address_index.height == len(reopened.chain)
+    reopened.chain.store.close()
+
+
+def test_fees_keep_their_formatting(make_blockchain):
+    no_fee = transfer('carol', 'dave', 1)
+    del no_fee['fee']
+    blockchain = make_blockchain([[transfer('alice', 'bob', 1, '0.0'), transfer('bob', 'carol', 1, '1.0'), no_fee]])
+    index = blockchain.get_address_index()
+    sent_fees = [entry['fee'] for sender in ('alice', 'bob', 'carol')
+                 for entry in index.history(sender) if entry['direction'] == 'out']
+    assert sent_fees == ['0.0', '1.0', '0']
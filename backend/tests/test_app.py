@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+# Keep the node's chain in memory instead of the default on-disk chain_data directory
+os.environ['CHAIN_DATA_DIR'] = ''
+os.environ['VALIDATION_WORKERS'] = '1'
+
+import app as node # noqa: E402
+from block_codec import CHAIN_MIMETYPE, decode_chain # noqa: E402
+from conftest import transfer # noqa: E402
+
+NDJSON = 'application/x-ndjson'
+
+
+@pytest.fixture
+def client():
+    return node.app.test_client()
+
+
+def ndjson(block_dicts):
+    # Blank lines are allowed between blocks
+    return ('\n'.join(json.dumps(block_dict) for block_dict in block_dicts) + '\n\n').encode('utf-8')
+
+
+def test_ndjson_blocks_round_trip(chain):
+    parsed = list(node._ndjson_blocks(io.BytesIO(ndjson(block.to_dict() for block in chain))))
+    assert [block.to_dict() for block in parsed] == [block.to_dict() for block in chain]
+    assert [block.hash_input() for block in parsed] == [block.hash_input() for block in chain]
+
+
+def test_ndjson_upload_is_validated(client, chain):
+    response = client.post('/api/validate_chain_state', data=ndjson(block.to_dict() for block in chain), content_type=NDJSON)
+    assert response.status_code == 200
+    assert response.get_json()['is_valid']
+
+    block_dicts = [block.to_dict() for block in chain]
+    block_dicts[2]['data'][0]['amount'] = '1000'
+    response = client.post('/api/validate_chain_state', data=ndjson(block_dicts), content_type=NDJSON)
+    assert response.get_json()['first_invalid_index'] == 2
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda block_dicts: block_dicts[1].update(data={'from_addr': 'alice'}), # Version 2 data must be a list
+    lambda block_dicts: block_dicts[1].update(version=99),
+    lambda block_dicts: block_dicts[1].pop('hash'),
+])
+def test_malformed_ndjson_block_is_rejected(client, chain, corrupt):
+    block_dicts = [block.to_dict() for block in chain]
+    corrupt(block_dicts)
+    response = client.post('/api/validate_chain_state', data=ndjson(block_dicts), content_type=NDJSON)
+    assert response.status_code == 400
+
+
+def test_invalid_json_line_is_rejected(client, chain):
+    body = ndjson([chain[0].to_dict()]) + b'{not json\n'
+    response = client.post('/api/validate_chain_state', data=body, content_type=NDJSON)
+    assert response.status_code == 400
+
+
+def mine_on_node():
+    with node.chain_lock:
+        return node.blockchain_node.add_block([transfer('alice', 'bob', 1)])
+
+
+def test_matching_etag_gets_304_until_the_node_changes(client):
+    first = client.get('/api/blockchain')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    unchanged = client.get('/api/blockchain', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+    # Binary responses are a different representation with their own tag
+    assert client.get('/api/blockchain', headers={'Accept': CHAIN_MIMETYPE}).headers['ETag'] != etag
+
+    transaction = dict(transfer('alice', 'bob', 1), idempotency_key=uuid.uuid4().hex)
+    node.mempool.add(transaction)
+    changed = client.get('/api/blockchain', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['mempool_size'] == first.get_json()['mempool_size'] + 1
+
+
+def test_delta_returns_only_blocks_after_a_known_tip(client):
+    before = client.get('/api/blockchain').get_json()
+    tip_index, tip_hash = before['length'] - 1, before['tip_hash']
+    block = mine_on_node()
+
+    delta = client.get(f'/api/blockchain?since_index={tip_index}&since_hash={tip_hash}').get_json()
+    assert delta['delta'] is True
+    assert delta['from'] == tip_index + 1
+    assert [block_dict['hash'] for block_dict in delta['chain']] == [block.hash]
+
+    binary = client.get(f'/api/blockchain?since_index={tip_index}&since_hash={tip_hash}',
+                        headers={'Accept': CHAIN_MIMETYPE})
+    assert binary.headers['X-Chain-Delta'] == 'true'
+    assert [decoded.hash for decoded in decode_chain(io.BytesIO(binary.data))] == [block.hash]
+
+
+def test_unknown_tip_gets_the_full_chain(client):
+    mine_on_node()
+    full = client.get('/api/blockchain?since_index=1&since_hash=' + 'ab' * 32).get_json()
+    assert full['delta'] is False
+    assert full['from'] == 0
+    assert len(full['chain']) == full['length']
+
+    ranged = client.get('/api/blockchain?from=1&to=1').get_json()
+    assert [block_dict['index'] for block_dict in ranged['chain']] == [1]
+
+
+def test_add_transaction_is_idempotent_per_key(client):
+    payment = dict(transfer('erin', 'frank', 2), idempotency_key=uuid.uuid4().hex)
+    first = client.post('/api/add_transaction', json=payment)
+    assert first.status_code == 201
+    assert client.post('/api/add_transaction', json=payment).status_code == 409 # Retry
+    second = client.post('/api/add_transaction', json=dict(payment, idempotency_key=uuid.uuid4().hex))
+    assert second.status_code == 201
+    assert second.get_json()['txid'] != first.get_json()['txid']
+
+    del payment['idempotency_key']
+    assert client.post('/api/add_transaction', json=payment).status_code == 400
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from block_codec import (encode_block, decode_block, encode_chain, decode_chain, STREAM_HEADER, RECORD_LENGTH,
+                         MAX_RECORD_BYTES)
+from blockchain import Blockchain, Block, LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION
+
+# Runs a test on a version 1 and a version 2 chain
+both_versions = pytest.mark.parametrize('chain', [LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION], indirect=True)
+
+
+def decoded(payload):
+    return list(decode_chain(io.BytesIO(payload)))
+
+
+@both_versions
+def test_chain_round_trip(chain):
+    blocks = decoded(b''.join(encode_chain(chain)))
+    assert [block.to_dict() for block in blocks] == [block.to_dict() for block in chain]
+    assert [block.hash_input() for block in blocks] == [block.hash_input() for block in chain]
+    assert [block.mined_timestamp for block in blocks] == [block.mined_timestamp for block in chain]
+    assert Blockchain.validate_chain_structure(blocks)['is_valid']
+
+
+@both_versions
+def test_header_only_and_text_hash_round_trip(chain):
+    header = chain[1].header_only()
+    assert decode_block(encode_block(header)).to_dict() == header.to_dict()
+    # Hashes that aren't 64 hex digits (the genesis previous_hash "0") are kept as text
+    assert decode_block(encode_block(chain[0])).previous_hash == '0'
+
+
+@both_versions
+def test_truncated_stream_raises(chain):
+    payload = b''.join(encode_chain(chain))
+    last_record_start = len(payload) - len(encode_block(chain[-1])) - RECORD_LENGTH.size
+    for cut in range(last_record_start + 1, len(payload)):
+        with pytest.raises(ValueError):
+            decoded(payload[:cut])
+    # Cut at a record boundary: simply fewer blocks
+    assert len(decoded(payload[:last_record_start])) == len(chain) - 1
+
+
+@both_versions
+def test_malformed_streams_raise(chain):
+    with pytest.raises(ValueError):
+        decoded(b'JSON' + b''.join(encode_chain(chain))[len(STREAM_HEADER):])
+    with pytest.raises(ValueError):
+        decoded(STREAM_HEADER + RECORD_LENGTH.pack(MAX_RECORD_BYTES + 1))
+    with pytest.raises(ValueError):
+        decode_block(encode_block(chain[1])[:10])
+
+
+def test_version_2_data_must_be_a_list():
+    block = Block(1, '2025-01-01 00:00:00.000000', {'from_addr': 'alice'}, 'ab' * 32, 0, version=LEGACY_BLOCK_VERSION)
+    record = bytearray(encode_block(block))
+    record[0] = MERKLE_BLOCK_VERSION # Same record, claiming version 2
+    with pytest.raises(ValueError):
+        decode_block(bytes(record))
@@ -0,0 +1,142 @@
+import os
+import zlib
+
+import pytest
+
+from block_store import BlockStore, PersistentChain, LOG_FILENAME, INDEX_FILENAME, RECORD_HEADER, block_to_record
+from blockchain import Blockchain
+from conftest import transfer
+
+
+def filled_store(directory, chain):
+    store = BlockStore(str(directory))
+    for block in chain:
+        store.append(block)
+    store.close()
+    return os.path.join(str(directory), LOG_FILENAME), os.path.join(str(directory), INDEX_FILENAME)
+
+
+def test_reopen_reads_identical_blocks(tmp_path, chain):
+    filled_store(tmp_path, chain)
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain)
+    for height, block in enumerate(chain):
+        assert store.read(height) == block_to_record(block)
+        assert store.get_block(height).to_dict() == block.to_dict()
+    store.close()
+
+
+def test_torn_record_at_log_end_is_cut_off(tmp_path, chain):
+    log_path, _ = filled_store(tmp_path, chain)
+    intact_size = os.path.getsize(log_path)
+    # A crash while appending: a header announcing 100 bytes, only 10 of them written
+    with open(log_path, 'ab') as f:
+        f.write(RECORD_HEADER.pack(100, 0) + b'x' * 10)
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain)
+    assert os.path.getsize(log_path) == intact_size
+    assert store.get_block(len(chain) - 1).hash == chain[-1].hash
+    store.close()
+
+
+@pytest.mark.parametrize('tail', [
+    b'\x00' * 4096, # Blocks the file system allocated but never wrote
+    RECORD_HEADER.pack(2, 12345) + b'{}', # Complete record, wrong checksum
+    RECORD_HEADER.pack(2, zlib.crc32(b'{x')) + b'{x', # Checksum matches, JSON doesn't parse
+])
+def test_corrupt_tail_is_cut_off(tmp_path, chain, tail):
+    log_path, _ = filled_store(tmp_path, chain)
+    intact_size = os.path.getsize(log_path)
+    with open(log_path, 'ab') as f:
+        f.write(tail + block_to_record(chain[-1])) # Nothing after the first bad record is kept
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain)
+    assert os.path.getsize(log_path) == intact_size
+    store.close()
+
+
+def test_indexed_records_that_fail_their_checksum_are_dropped(tmp_path, chain):
+    log_path, index_path = filled_store(tmp_path, chain)
+    # Both index entries reached the disk, but the log's last two records were zero-filled
+    second_to_last = RECORD_HEADER.size * (len(chain) - 2) + sum(len(block_to_record(block)) for block in chain[:-2])
+    size = os.path.getsize(log_path)
+    with open(log_path, 'r+b') as f:
+        f.seek(second_to_last)
+        f.write(b'\x00' * (size - second_to_last))
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain) - 2
+    assert os.path.getsize(log_path) == second_to_last
+    assert os.path.getsize(index_path) == 8 * (len(chain) - 2)
+    assert store.get_block(len(store) - 1).hash == chain[-3].hash
+    store.close()
+
+
+def test_index_entries_past_the_log_are_dropped(tmp_path, chain):
+    log_path, _ = filled_store(tmp_path, chain)
+    # The index reached the disk but the last log record didn't
+    last_offset = RECORD_HEADER.size * (len(chain) - 1) + sum(len(block_to_record(block)) for block in chain[:-1])
+    with open(log_path, 'r+b') as f:
+        f.truncate(last_offset)
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain) - 1
+    assert store.get_block(len(store) - 1).hash == chain[-2].hash
+    store.close()
+
+
+def test_records_missing_from_the_index_are_reindexed(tmp_path, chain):
+    _, index_path = filled_store(tmp_path, chain)
+    # The log reached the disk but the last two index entries didn't
+    with open(index_path, 'r+b') as f:
+        f.truncate(8 * (len(chain) - 2))
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == len(chain)
+    assert os.path.getsize(index_path) == 8 * len(chain)
+    assert [store.get_block(height).hash for height in range(len(store))] == [block.hash for block in chain]
+    store.close()
+
+
+def test_truncate_survives_reopen_and_allows_appending(tmp_path, chain):
+    filled_store(tmp_path, chain)
+    store = BlockStore(str(tmp_path))
+    store.truncate(2)
+    assert len(store) == 2
+    store.close()
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == 2
+    store.append(chain[2])
+    assert store.get_block(2).hash == chain[2].hash
+    with pytest.raises(ValueError):
+        store.append(chain[2]) # Not the next height
+    store.close()
+
+
+def test_persistent_chain_truncate_drops_cached_blocks(tmp_path, chain):
+    store = BlockStore(str(tmp_path))
+    persistent = PersistentChain(store)
+    for block in chain:
+        persistent.append(block)
+    persistent.truncate(1)
+    assert len(persistent) == 1
+    with pytest.raises(IndexError):
+        persistent[1]
+    store.close()
+
+
+def test_blockchain_resumes_from_a_recovered_store(tmp_path, make_blockchain):
+    blockchain = make_blockchain([[transfer('alice', 'bob', 1)]], store=BlockStore(str(tmp_path)))
+    tip = blockchain.get_latest_block()
+    blockchain.chain.store.close()
+    with open(os.path.join(str(tmp_path), LOG_FILENAME), 'ab') as f:
+        f.write(b'\x00\x00') # Torn record header
+
+    reopened = Blockchain(initial_difficulty=1, store=BlockStore(str(tmp_path)), difficulty_adjustment_interval=0)
+    assert len(reopened.chain) == 2
+    assert reopened.get_latest_block().hash == tip.hash
+    assert Blockchain.validate_chain_structure(list(reopened.chain))['is_valid']
+    reopened.chain.store.close()
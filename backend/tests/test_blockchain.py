@@ -0,0 +1,35 @@
+from block_store import BlockStore
+from blockchain import Blockchain
+from conftest import transfer
+
+
+def failing_listener(*args):
+    raise RuntimeError("listener bug")
+
+
+def test_failing_listeners_dont_undo_or_fail_chain_changes(make_blockchain):
+    blockchain = make_blockchain()
+    seen = []
+    blockchain.add_block_listener(failing_listener)
+    blockchain.add_block_listener(seen.append)
+    block = blockchain.add_block([transfer('alice', 'bob', 1)])
+    assert blockchain.get_latest_block() is block
+    assert seen == [block] # Later listeners still run
+
+    other = make_blockchain(genesis_block=blockchain.chain[0])
+    other.add_replace_listener(failing_listener)
+    other.replace_chain(list(blockchain.chain))
+    assert other.get_latest_block().hash == block.hash
+
+
+def test_range_read_only_touches_the_requested_blocks(tmp_path, make_blockchain):
+    blockchain = make_blockchain([[transfer('alice', 'bob', i + 1)] for i in range(5)], store=BlockStore(str(tmp_path)))
+    expected = [block.to_dict() for block in blockchain.chain]
+    blockchain.chain.store.close()
+
+    reopened = Blockchain(initial_difficulty=1, store=BlockStore(str(tmp_path)), difficulty_adjustment_interval=0)
+    assert reopened.get_chain_data(3, 5) == expected[3:5]
+    assert set(reopened.chain._cache) <= {3, 4, 5} # The range and the tip (read at startup), nothing before
+    assert set(reopened._block_dicts) == {3, 4}
+    assert reopened.get_chain_data() == expected
+    reopened.chain.store.close()
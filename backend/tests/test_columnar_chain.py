@@ -0,0 +1,75 @@
+import pytest
+
+from blockchain import Block, Blockchain, LEGACY_BLOCK_VERSION
+from columnar_chain import ColumnarChain
+from conftest import transfer
+
+
+@pytest.fixture
+def reference(make_blockchain):
+    """A plain-list chain: genesis plus three blocks."""
+    return make_blockchain([[transfer('alice', 'bob', i + 1)] for i in range(3)])
+
+
+def columnar_copy(make_blockchain, reference):
+    blockchain = make_blockchain(columnar=True, genesis_block=reference.chain[0])
+    for block in reference.chain[1:]:
+        blockchain.accept_block(block)
+    return blockchain
+
+
+def test_blocks_round_trip_like_a_plain_list(make_blockchain, reference):
+    blockchain = columnar_copy(make_blockchain, reference)
+    assert isinstance(blockchain.chain, ColumnarChain)
+    assert blockchain.get_chain_data() == reference.get_chain_data()
+    assert [block.hash_input() for block in blockchain.chain] == [block.hash_input() for block in reference.chain]
+    assert [block.mined_timestamp for block in blockchain.chain] == [block.mined_timestamp for block in reference.chain]
+    assert Blockchain.validate_chain_structure(list(blockchain.chain))['is_valid']
+
+
+def test_indexing_and_slicing(make_blockchain, reference):
+    chain = columnar_copy(make_blockchain, reference).chain
+    hashes = [block.hash for block in reference.chain]
+    assert len(chain) == 4 and chain
+    assert chain[-1].hash == hashes[-1]
+    assert [block.hash for block in chain[1:3]] == hashes[1:3]
+    assert [block.hash for block in chain[::-2]] == hashes[::-2]
+    with pytest.raises(IndexError):
+        chain[4]
+    # Blocks are rebuilt on access, so changing one leaves the chain as it was
+    chain[1].data = []
+    assert chain[1].data == reference.chain[1].data
+
+
+def test_append_rejects_blocks_that_dont_fit(reference):
+    chain = ColumnarChain()
+    chain.append(reference.chain[0])
+    with pytest.raises(ValueError):
+        chain.append(reference.chain[2]) # Wrong height
+    unlinked = reference.chain[1].header_only()
+    unlinked.previous_hash = 'ab' * 32
+    with pytest.raises(ValueError):
+        chain.append(unlinked)
+    odd_hash = reference.chain[1].header_only()
+    odd_hash.hash = 'not a hash'
+    with pytest.raises(ValueError):
+        chain.append(odd_hash)
+    assert len(chain) == 1
+
+
+def test_odd_timestamps_and_legacy_blocks_are_kept_exactly():
+    chain = ColumnarChain()
+    for timestamp in ['2025-01-01T00:00:00', '2025-01-01 00:00:00.000001']:
+        block = Block(len(chain), timestamp, [{'info': 'x'}], chain[-1].hash if chain else '0', 1, version=LEGACY_BLOCK_VERSION)
+        chain.append(block)
+        assert chain[-1].to_dict() == block.to_dict()
+        assert chain[-1].merkle_root is None
+
+
+def test_replace_chain_on_a_columnar_chain(make_blockchain, reference):
+    blockchain = columnar_copy(make_blockchain, reference)
+    fork = make_blockchain([[transfer('carol', 'dave', 1)]] * 4, genesis_block=reference.chain[0])
+    assert blockchain.replace_chain(list(fork.chain)) == 1
+    assert blockchain.get_chain_data() == fork.get_chain_data()
+    assert blockchain.get_address_index().summary('dave')['transaction_count'] == 4
+    assert Blockchain.validate_chain_structure(list(blockchain.chain))['is_valid']
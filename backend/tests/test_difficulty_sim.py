@@ -0,0 +1,33 @@
+from collections import Counter
+
+from difficulty_sim import HashRateModel, simulate
+
+TARGET_SECONDS = 10
+# Hash rate at which difficulty 5 (16 ** 5 expected hashes) takes exactly the target time
+IDEAL_RATE = 16 ** 5 / TARGET_SECONDS
+
+
+def run(blocks, changes=(), seed=1):
+    return simulate(blocks, HashRateModel(IDEAL_RATE, changes, seed=seed), initial_difficulty=1,
+                    block_generation_interval=TARGET_SECONDS, difficulty_adjustment_interval=5)
+
+
+def test_same_seed_same_series():
+    assert run(300) == run(300)
+
+
+def test_difficulty_converges_on_the_target_interval():
+    series = run(2000)
+    # Climbs from 1 at one step per adjustment interval
+    assert series[25]['difficulty'] == 5
+    settled = Counter(point['difficulty'] for point in series[200:])
+    # Difficulty moves in 16x steps, so it hovers around the ideal one instead of sitting on it
+    assert settled.most_common(1)[0][0] == 5
+    assert settled[5] > 0.6 * len(series[200:])
+    assert set(settled) <= {4, 5, 6}
+
+
+def test_difficulty_follows_a_hash_rate_change():
+    series = run(3000, changes=[(40_000, IDEAL_RATE * 16)])
+    later = Counter(point['difficulty'] for point in series if point['time'] > 60_000)
+    assert later.most_common(1)[0][0] == 6
@@ -0,0 +1,80 @@
+import pytest
+
+from conftest import transfer
+from mempool import Mempool, DuplicateTransactionError, MempoolFullError, canonical_transaction, transaction_id
+
+
+def payment(amount, fee, idempotency_key=None):
+    transaction = transfer('alice', 'bob', amount, fee)
+    if idempotency_key is not None:
+        transaction['idempotency_key'] = idempotency_key
+    return transaction
+
+
+def test_highest_fee_first_then_first_come_first_served():
+    mempool = Mempool()
+    for amount, fee in [(1, '1.0'), (2, '5.0'), (3, '1.0'), (4, '5.0'), (5, '0.5')]:
+        mempool.add(payment(amount, fee))
+    assert [tx['amount'] for tx in mempool.transactions()] == ['2', '4', '1', '3', '5']
+    assert [tx['amount'] for tx in mempool.transactions(limit=2)] == ['2', '4']
+
+
+def test_retry_rejected_but_idempotency_key_distinguishes():
+    mempool = Mempool()
+    mempool.add(payment(1, '1.0', idempotency_key='a'))
+    with pytest.raises(DuplicateTransactionError):
+        mempool.add(payment(1, '1.0', idempotency_key='a')) # A retry of the same payment
+    # A second, identical payment: distinct keys, distinct ids
+    mempool.add(payment(1, '1.0', idempotency_key='b'))
+    assert len(mempool) == 2
+
+
+def test_full_mempool_evicts_lowest_fee():
+    mempool = Mempool(max_transactions=2)
+    low = mempool.add(payment(1, '1.0'))
+    mempool.add(payment(2, '2.0'))
+    mempool.add(payment(3, '3.0'))
+    assert low not in mempool
+    assert [tx['amount'] for tx in mempool.transactions()] == ['3', '2']
+    with pytest.raises(MempoolFullError):
+        mempool.add(payment(4, '0.5')) # Would be the one evicted itself
+
+
+def test_byte_cap_evicts_and_tracks_size():
+    first, second = payment(1, '1.0'), payment(2, '2.0')
+    size = len(canonical_transaction(first))
+    mempool = Mempool(max_bytes=size + len(canonical_transaction(second)) - 1)
+    mempool.add(first)
+    mempool.add(second)
+    assert len(mempool) == 1
+    assert mempool.size_bytes == len(canonical_transaction(second))
+
+
+def test_select_for_block_respects_limits_and_keeps_the_rest():
+    mempool = Mempool()
+    for amount in range(5):
+        mempool.add(payment(amount, str(float(amount))))
+    selected = mempool.select_for_block(max_transactions=2)
+    assert [tx['amount'] for tx in selected] == ['4', '3']
+    assert len(mempool) == 3
+
+
+def test_requeue_restores_arrival_order_among_equal_fees():
+    mempool = Mempool()
+    for amount in range(3):
+        mempool.add(payment(amount, '1.0'))
+    selected = mempool.select_for_block(max_transactions=1) # Oldest: amount 0
+    mempool.add(payment(9, '1.0'))
+    mempool.requeue(selected)
+    assert [tx['amount'] for tx in mempool.transactions()] == ['0', '1', '2', '9']
+
+
+def test_listeners_see_adds_evictions_and_removals():
+    mempool = Mempool(max_transactions=1)
+    changes = []
+    mempool.add_listener(lambda added, removed: changes.append(([txid for txid, _ in added], removed)))
+    first = mempool.add(payment(1, '1.0'))
+    second = mempool.add(payment(2, '2.0'))
+    mempool.select_for_block()
+    assert changes == [([first], []), ([second], [first]), ([], [second])]
+    assert second == transaction_id(payment(2, '2.0'))
@@ -0,0 +1,60 @@
+import pytest
+
+from blockchain import Blockchain, Block, MERKLE_BLOCK_VERSION
+from conftest import transfer
+from merkle import merkle_root, merkle_proof, verify_merkle_proof
+from validation import BatchValidator
+
+
+def payments(count):
+    return [transfer('alice', 'bob', i + 1) for i in range(count)]
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 8, 13])
+def test_every_transaction_has_a_valid_proof(count):
+    transactions = payments(count)
+    root = merkle_root(transactions)
+    for position, transaction in enumerate(transactions):
+        assert verify_merkle_proof(transaction, merkle_proof(transactions, position), root)
+
+
+def test_tampered_proof_or_transaction_fails():
+    transactions = payments(5)
+    root = merkle_root(transactions)
+    proof = merkle_proof(transactions, 2)
+    assert not verify_merkle_proof(transfer('alice', 'bob', 99), proof, root)
+    proof[0]['side'] = 'left' if proof[0]['side'] == 'right' else 'right'
+    assert not verify_merkle_proof(transactions[2], proof, root)
+    with pytest.raises(IndexError):
+        merkle_proof(transactions, 5)
+
+
+def forged_root_block():
+    """Genesis-position v2 block whose stored Merkle root isn't its data's (hash computed from the data)."""
+    return Block(0, '2025-01-01 00:00:00.000000', payments(2), None, 0, version=MERKLE_BLOCK_VERSION,
+                 merkle_root='ab' * 32)
+
+
+def test_stored_merkle_root_must_match_the_data():
+    block = forged_root_block()
+    assert block.hash == block.calculate_hash() # The hash alone would pass
+    assert not Blockchain.check_block(block, None, 0)
+    assert Blockchain.validate_chain_structure([block]) == {'is_valid': False, 'first_invalid_index': 0}
+
+
+def test_batch_validator_rejects_a_forged_merkle_root():
+    validator = BatchValidator(workers=1)
+    try:
+        assert validator.validate([forged_root_block()])['first_invalid_index'] == 0
+    finally:
+        validator.close()
+
+
+def test_valid_v2_chain_and_header_only_blocks_pass(make_blockchain):
+    blockchain = make_blockchain([payments(3), payments(4)], block_version=MERKLE_BLOCK_VERSION)
+    chain = list(blockchain.chain)
+    assert Blockchain.validate_chain_structure(chain)['is_valid']
+    # Without data the stored root is all there is to hash
+    headers = [block.header_only() for block in chain]
+    assert Blockchain.validate_chain_structure(headers)['is_valid']
+    assert chain[1].merkle_root == merkle_root(chain[1].data)
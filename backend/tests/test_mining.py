@@ -0,0 +1,84 @@
+import os
+import signal
+import threading
+
+import pytest
+
+from blockchain import Block, LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION
+from conftest import transfer
+from mining import MidstateMiner, ParallelMiner, MiningCancelled
+
+
+def template_block(version=MERKLE_BLOCK_VERSION):
+    return Block(1, '2025-01-01 00:00:00.000000', [transfer('alice', 'bob', 1)], 'ab' * 32, 2, version=version)
+
+
+DATA_SHAPES = [
+    [],
+    [transfer('alice', 'bob', 1)],
+    [{'info': 'Genesis Block'}, {'nested': {'b': [1, 2.5, None, True], 'a': 'x'}}],
+    [{'memo': 'caf\u00e9 \u2603 "quoted" \\ back'}] * 3, # Non-ASCII and escapes
+    [transfer('alice', 'bob', i, fee=str(i / 10)) for i in range(200)],
+]
+
+
+@pytest.mark.parametrize('version', [LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION])
+@pytest.mark.parametrize('data', DATA_SHAPES)
+def test_midstate_hashes_match_calculate_hash(version, data):
+    block = Block(7, '2025-01-01 00:00:00.123456', data, 'ab' * 32, 3, version=version)
+    prefix, suffix = block.hash_template()
+    miner = MidstateMiner(prefix, suffix, block.difficulty)
+    for nonce in [0, 1, 9, 10, 4095, 4096, 123456789, 2 ** 63]:
+        block.nonce = nonce
+        assert miner.hash_nonce(nonce) == block.calculate_hash()
+        assert prefix + str(nonce).encode() + suffix == block.hash_input()
+
+
+@pytest.mark.parametrize('version', [LEGACY_BLOCK_VERSION, MERKLE_BLOCK_VERSION])
+def test_midstate_search_finds_the_first_valid_nonce(version):
+    block = Block(1, '2025-01-01 00:00:00.000000', DATA_SHAPES[2], 'ab' * 32, 2, version=version)
+    nonce, found_hash = MidstateMiner(*block.hash_template(), block.difficulty).search()
+    block.nonce = nonce
+    assert found_hash == block.calculate_hash()
+    for earlier in range(nonce):
+        block.nonce = earlier
+        assert not block.calculate_hash().startswith('00')
+
+
+@pytest.fixture
+def parallel_miner():
+    miner = ParallelMiner(workers=2, chunk_size=512, drain_timeout=1).start()
+    yield miner
+    miner.close()
+
+
+def test_parallel_miner_finds_a_valid_nonce(parallel_miner):
+    block = template_block()
+    prefix, suffix = block.hash_template()
+    nonce, found_hash = parallel_miner.mine(prefix, suffix, block.difficulty)
+    block.nonce = nonce
+    assert found_hash == block.calculate_hash()
+    assert found_hash.startswith('00')
+
+
+def test_lost_chunk_terminates_the_pool_instead_of_hanging():
+    prefix, suffix = template_block().hash_template()
+    # Chunks long enough that both workers are busy hashing when one is killed
+    miner = ParallelMiner(workers=2, chunk_size=10 ** 8, drain_timeout=1).start()
+    cancel = threading.Event()
+
+    def kill_a_worker_then_cancel():
+        os.kill(miner._pool._pool[0].pid, signal.SIGKILL) # Its chunk never comes back
+        cancel.set()
+
+    threading.Timer(0.5, kill_a_worker_then_cancel).start()
+    try:
+        with pytest.raises(MiningCancelled):
+            miner.mine(prefix, suffix, 64, cancel_event=cancel) # Unreachable difficulty
+        assert miner._pool is None
+
+        # The next search starts a new pool
+        nonce, found_hash = miner.mine(prefix, suffix, 1)
+        assert found_hash == MidstateMiner(prefix, suffix, 1).hash_nonce(nonce)
+    finally:
+        miner.close()
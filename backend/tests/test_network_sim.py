@@ -0,0 +1,50 @@
+import network_sim
+from conftest import transfer
+from network_sim import Node, SimulatedNetwork, build_network
+
+
+def chain_hashes(node):
+    return [block.hash for block in node.blockchain.chain]
+
+
+def test_more_work_beats_a_longer_chain(make_blockchain):
+    genesis = make_blockchain().chain[0]
+    network = SimulatedNetwork()
+    light = Node('light', network, genesis)
+    heavy = Node('heavy', network, genesis)
+    heavy.blockchain.difficulty = 2 # Difficulty carries on from the genesis block otherwise
+    network.connect_all()
+
+    txid = light.submit_transaction(transfer('alice', 'bob', 1))
+    network._queue.clear() # Only the light node ever saw it
+    for _ in range(4):
+        light.mine_block(announce=False) # 4 blocks of 16 expected hashes
+    for _ in range(2):
+        heavy.mine_block(announce=False) # 2 blocks of 256
+
+    assert not heavy.sync_from(light)
+    assert len(heavy.blockchain.chain) == 3
+    assert light.sync_from(heavy)
+    assert chain_hashes(light) == chain_hashes(heavy)
+    # The abandoned branch's transaction went back into the mempool
+    assert txid in light.mempool
+
+
+def test_announced_tip_makes_peers_sync_and_converge(make_blockchain, monkeypatch):
+    # Small messages, so headers and bodies both take several round trips
+    monkeypatch.setattr(network_sim, 'MAX_HEADERS_PER_MESSAGE', 2)
+    monkeypatch.setattr(network_sim, 'BODY_BATCH_SIZE', 2)
+    network = build_network(3)
+    miner, *others = network.nodes
+    for i in range(5):
+        miner.submit_transaction(transfer('alice', 'bob', i + 1))
+        miner.mine_block(announce=False)
+    network.run() # Transactions only
+    assert all(len(node.mempool) == 5 for node in others)
+
+    miner.announce() # Only the tip: its parent is unknown to the others
+    network.run()
+    for node in others:
+        assert chain_hashes(node) == chain_hashes(miner)
+        assert len(node.mempool) == 0
+    assert network.stats.snapshot()
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from blockchain import Block, Blockchain, MERKLE_BLOCK_VERSION
+from conftest import transfer
+from validation import BatchValidator, ChainValidator
+
+
+@pytest.fixture
+def batch_validator():
+    validator = BatchValidator(workers=1, chunk_size=2)
+    yield validator
+    validator.close()
+
+
+def test_serial_batch_and_stream_paths_agree(chain, batch_validator, make_blockchain):
+    assert batch_validator.validate(chain)['is_valid']
+    # Unsupported versions fail the batch path too, not only check_block()
+    chain[3].version = 3
+    expected = Blockchain.validate_chain_structure(chain)
+    assert expected == {'is_valid': False, 'first_invalid_index': 3}
+    assert batch_validator.validate(chain) == expected
+
+    result = ChainValidator(make_blockchain()).validate_stream(iter(chain))
+    assert result['first_invalid_index'] == 3
+    assert result['blocks_received'] == 4 # Stopped reading at the invalid block
+
+
+def test_stream_stops_pulling_at_the_first_tampered_block(chain, make_blockchain):
+    chain[2].data[0]['amount'] = '1000'
+    pulled = []
+
+    def blocks():
+        for block in chain:
+            pulled.append(block.index)
+            yield block
+
+    result = ChainValidator(make_blockchain()).validate_stream(blocks())
+    assert result['first_invalid_index'] == 2
+    assert pulled == [0, 1, 2]
+
+
+def as_submitted(blocks):
+    """Copies of the blocks as a client sends them back: JSON with sorted keys."""
+    copies = []
+    for block in blocks:
+        block_dict = json.loads(json.dumps(block.to_dict(), sort_keys=True))
+        copies.append(Block(block_dict['index'], block_dict['timestamp'], block_dict['data'], block_dict['previous_hash'],
+                            block_dict['difficulty'], block_dict['nonce'], block_dict['hash'],
+                            version=block_dict['version'], merkle_root=block_dict.get('merkle_root')))
+    return copies
+
+
+@pytest.fixture
+def node(chain, make_blockchain):
+    """A node holding the first three blocks of `chain`."""
+    blockchain = make_blockchain(genesis_block=chain[0], block_version=MERKLE_BLOCK_VERSION)
+    blockchain.replace_chain(chain[:3])
+    return blockchain
+
+
+def test_only_blocks_past_the_known_prefix_are_rehashed(chain, node):
+    validator = ChainValidator(node)
+    first = validator.validate(as_submitted(chain))
+    assert first == {'is_valid': True, 'first_invalid_index': None, 'revalidated_from': 3}
+    # The two new blocks are remembered; the node's own blocks aren't copied into the cache
+    assert sorted(index for index, _ in validator._verified) == [3, 4]
+    assert all(len(fingerprint) == 32 for fingerprint in validator._verified.values())
+
+    # Re-submitted unchanged: nothing is rehashed
+    assert validator.validate(as_submitted(chain))['revalidated_from'] == len(chain)
+
+    tampered = as_submitted(chain)
+    tampered[4].data[0]['amount'] = '1000'
+    assert validator.validate(tampered) == {'is_valid': False, 'first_invalid_index': 4, 'revalidated_from': 4}
+
+
+def test_verified_cache_is_bounded(chain, node):
+    validator = ChainValidator(node, cache_size=1)
+    validator.validate(as_submitted(chain))
+    assert [index for index, _ in validator._verified] == [4]
+    assert validator.validate(as_submitted(chain))['revalidated_from'] == 3
+
+
+def test_own_blocks_are_forgotten_after_a_chain_switch(chain, node, make_blockchain):
+    validator = ChainValidator(node)
+    assert validator.validate(as_submitted(chain[:3]))['revalidated_from'] == 3
+
+    fork = make_blockchain([[transfer('carol', 'dave', 1)]] * 2, genesis_block=chain[0], block_version=MERKLE_BLOCK_VERSION)
+    node.replace_chain(list(fork.chain))
+    assert validator.validate(as_submitted(chain[:3]))['revalidated_from'] == 1
+    assert validator.validate(as_submitted(fork.chain))['revalidated_from'] == 3
+
+
+def test_stream_state_stays_bounded(chain, make_blockchain):
+    validator = ChainValidator(make_blockchain(), cache_size=2)
+    validator.validate_stream(iter(as_submitted(chain)))
+    assert len(validator._verified) == 2
+    assert all(len(fingerprint) == 32 for fingerprint in validator._verified.values())
+    # Block 0 fell out of the cache, so a re-sent stream is rehashed from the start
+    assert validator.validate_stream(iter(as_submitted(chain)))['revalidated_from'] == 0
@@ -0,0 +1,366 @@
+# --- validation.py (Incremental Chain Validation) ---
+import hashlib
+import json
+import logging
+import marshal
+import multiprocessing
+import threading
+from collections import OrderedDict, deque
+from time import perf_counter
+
+from blockchain import Block, Blockchain, SUPPORTED_BLOCK_VERSIONS
+from metrics import REGISTRY
+from node_logging import get_logger
+
+log = get_logger('validation')
+
+# marshal format 2 predates object references and interning flags, so equal values
+# always produce equal bytes (with format 3+ the output depends on refcounts)
+FINGERPRINT_MARSHAL_VERSION = 2
+# Max number of externally validated blocks remembered (oldest are evicted first)
+VERIFIED_CACHE_SIZE = 10000
+# Suffixes at least this long go to the BatchValidator (if one is configured)
+BATCH_VALIDATION_THRESHOLD = 5000
+
+
+def block_fingerprint(block, data=None):
+    """
+    32-byte SHA-256 digest of an exact, type-strict snapshot of every field that goes into
+    the block hash plus the stored hash and Merkle root. Two blocks with equal fingerprints
+    hash identically, so a block whose fingerprint matches an already verified block needs
+    no rehash. marshal is used because it is C-fast and (unlike ==) distinguishes 1, 1.0
+    and True, which JSON hashing does too. marshal keeps dict key order, so blocks whose
+    dicts differ only in key order just miss (and get rehashed). Only the digest is kept,
+    so a cached fingerprint costs the same however large the block is. Returns None for
+    blocks holding values marshal can't encode.
+    """
+    if data is None:
+        data = block.data
+    try:
+        snapshot = marshal.dumps((block.version, block.index, block.timestamp, data, block.previous_hash,
+                                  block.difficulty, block.nonce, block.hash, block.merkle_root),
+                                 FINGERPRINT_MARSHAL_VERSION)
+    except ValueError:
+        return None
+    return hashlib.sha256(snapshot).digest()
+
+
+class ChainValidator:
+    """
+    Validates externally submitted chains, re-hashing only what hasn't been verified yet.
+
+    A submitted chain is walked from genesis for as long as each block is identical to the
+    node's own block at that height, or to a block from a recently validated external chain
+    (kept in a bounded LRU keyed by (index, hash)), and links to its predecessor. Full
+    validation (hash recomputation + PoW) only starts at the first block that differs, so
+    the cost of re-validating after a tamper edit scales with the edited suffix.
+    Long suffixes are handed to `batch_validator` (a BatchValidator) when one is given.
+
+    `chain_lock` is the lock the owner holds around every change to blockchain.chain
+    (appends, replace_chain); the node's blocks are only read under it. It also guards the
+    cached fingerprints of those blocks, which replace_chain() listeners truncate.
+    """
+
+    def __init__(self, blockchain, chain_lock=None, cache_size=VERIFIED_CACHE_SIZE, batch_validator=None,
+                 batch_threshold=BATCH_VALIDATION_THRESHOLD):
+        self.blockchain = blockchain
+        self.chain_lock = chain_lock or threading.RLock()
+        self.cache_size = cache_size
+        self.batch_validator = batch_validator
+        self.batch_threshold = batch_threshold
+        self._own_fingerprints = [] # Fingerprints of blockchain.chain[:len(...)], built lazily (guarded by chain_lock)
+        self._own_generation = 0 # Bumped on every chain replacement
+        self._verified = OrderedDict() # (index, hash) -> fingerprint of an externally verified block
+        self._lock = threading.Lock()
+        blockchain.add_replace_listener(self._chain_replaced)
+
+    def _chain_replaced(self, fork_height, removed_blocks, added_blocks):
+        # Runs under chain_lock (held around replace_chain), which guards the fingerprint cache.
+        # Taking self._lock here would invert the self._lock -> chain_lock order of validate().
+        # Own blocks past the fork point are gone; their fingerprints are rebuilt lazily
+        del self._own_fingerprints[fork_height:]
+        self._own_generation += 1
+
+    def _own_fingerprint(self, position):
+        with self.chain_lock:
+            if position < len(self._own_fingerprints):
+                return self._own_fingerprints[position]
+            if position >= len(self.blockchain.chain):
+                return None
+            generation = self._own_generation
+            start = len(self._own_fingerprints)
+            # Snapshot the blocks (a PersistentChain may remap its file once the lock is released)
+            blocks = self.blockchain.chain[start:position + 1]
+
+        # Fingerprint the snapshot without holding up miners and readers of the chain
+        # Clients get our blocks as JSON with sorted keys and send them back in that order
+        fingerprints = [block_fingerprint(block, json.loads(json.dumps(block.data, sort_keys=True)))
+                        for block in blocks]
+        with self.chain_lock:
+            # Only cache them if the chain wasn't replaced meanwhile
+            if self._own_generation == generation and len(self._own_fingerprints) == start:
+                self._own_fingerprints.extend(fingerprints)
+        # Still a block the node verified itself, even if it has just been replaced
+        return fingerprints[-1]
+
+    def _is_verified(self, position, block):
+        fingerprint = block_fingerprint(block)
+        if fingerprint is None:
+            return False
+        if fingerprint == self._own_fingerprint(position):
+            return True
+        key = (block.index, block.hash)
+        if self._verified.get(key) == fingerprint:
+            self._verified.move_to_end(key)
+            return True
+        return False
+
+    def verified_prefix_length(self, chain_to_validate):
+        """Number of leading blocks that are already known-good and correctly linked."""
+        for i, block in enumerate(chain_to_validate):
+            if i > 0:
+                previous_block = chain_to_validate[i - 1]
+                if block.index != previous_block.index + 1 or block.previous_hash != previous_block.hash:
+                    return i
+            if not self._is_verified(i, block):
+                return i
+        return len(chain_to_validate)
+
+    def validate(self, chain_to_validate):
+        """Same result as Blockchain.validate_chain_structure(chain_to_validate)."""
+        with self._lock:
+            start_index = self.verified_prefix_length(chain_to_validate)
+            if self.batch_validator is not None and len(chain_to_validate) - start_index >= self.batch_threshold:
+                result = self.batch_validator.validate(chain_to_validate, start_index=start_index)
+            else:
+                result = Blockchain.validate_chain_structure(chain_to_validate, start_index=start_index)
+
+            # Remember every block that passed, for the next request
+            verified_end = len(chain_to_validate) if result['is_valid'] else result['first_invalid_index']
+            for block in chain_to_validate[start_index:verified_end]:
+                self._remember(block)
+
+            result['revalidated_from'] = start_index
+            return result
+
+    def _remember(self, block):
+        fingerprint = block_fingerprint(block)
+        if fingerprint is None:
+            return
+        key = (block.index, block.hash)
+        self._verified[key] = fingerprint
+        self._verified.move_to_end(key)
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+
+    def validate_stream(self, blocks):
+        """
+        Validates blocks one at a time as an iterable yields them (e.g. parsed NDJSON lines
+        of an upload) and stops pulling at the first invalid block, so the rest is never read.
+        Only the previous block is held, so memory stays flat however long the chain is:
+        blocks that pass are remembered as in validate(), but only as 32-byte fingerprints
+        in the verified cache, which never grows past cache_size entries. Leading
+        already-verified blocks skip the rehash as in validate(). The result adds
+        blocks_received: how many blocks were read before stopping.
+        """
+        started = perf_counter()
+        debug = log.isEnabledFor(logging.DEBUG)
+        previous_block = None
+        revalidated_from = None # Position of the first block that wasn't already verified
+        first_invalid = None
+        received = 0
+        for position, block in enumerate(blocks):
+            received = position + 1
+            if revalidated_from is None:
+                linked = previous_block is None or (block.index == previous_block.index + 1
+                                                    and block.previous_hash == previous_block.hash)
+                with self._lock:
+                    known = linked and self._is_verified(position, block)
+                if known:
+                    previous_block = block
+                    continue
+                revalidated_from = position
+
+            if not Blockchain.check_block(block, previous_block, position, debug):
+                first_invalid = position
+                break
+            with self._lock:
+                self._remember(block)
+            previous_block = block
+
+        if revalidated_from is None:
+            revalidated_from = received
+        blocks_checked = received - revalidated_from
+        elapsed = perf_counter() - started
+        if blocks_checked > 0:
+            REGISTRY.histogram('validation_seconds_per_block').observe(elapsed / blocks_checked)
+        log.info("Streamed validation read %s blocks (%s rehashed) in %.3fs. First invalid index: %s",
+                 received, blocks_checked, elapsed, first_invalid)
+        return {'is_valid': first_invalid is None, 'first_invalid_index': first_invalid,
+                'revalidated_from': revalidated_from, 'blocks_received': received}
+
+
+# --- Parallel batch validation ---
+# Blocks per task handed to a validation worker
+DEFAULT_VALIDATION_CHUNK_SIZE = 2000
+
+# Chunks per worker kept in flight (each one is a serialized slice of the chain)
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+_BLOCK_SLOTS = Block.__slots__
+
+# Worker-side state, set up by the pool initializer
+_worker_stop_event = None
+
+
+def _init_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+
+def _pack_blocks(blocks):
+    """
+    A chain slice for a worker task: the blocks' slot values marshalled into one bytes
+    object, several times cheaper to build and load than pickled Blocks. Falls back to
+    the Blocks themselves (pickled by the pool) if some value can't be marshalled.
+    """
+    try:
+        return marshal.dumps([tuple(getattr(block, slot) for slot in _BLOCK_SLOTS) for block in blocks])
+    except ValueError:
+        return blocks
+
+
+def _unpack_blocks(payload):
+    if type(payload) is not bytes:
+        return payload
+    blocks = []
+    for state in marshal.loads(payload):
+        block = Block.__new__(Block)
+        for slot, value in zip(_BLOCK_SLOTS, state):
+            setattr(block, slot, value)
+        blocks.append(block)
+    return blocks
+
+
+def _check_chunk(task):
+    """
+    Worker task: the checks of Blockchain.check_block() that need no other block (version,
+    hash and Merkle root, PoW) for a slice of blocks (see _pack_blocks) starting at chain
+    position `start`. Returns the position of the first failing block, or None.
+    """
+    start, payload = task
+    if _worker_stop_event.is_set():
+        return None
+    blocks = _unpack_blocks(payload)
+    for offset, block in enumerate(blocks):
+        if (block.version not in SUPPORTED_BLOCK_VERSIONS or block.hash != block.recalculate_hash()
+                or block.hash[:block.difficulty] != "0" * block.difficulty):
+            return start + offset
+    return None
+
+
+class BatchValidator:
+    """
+    Validates long chains with hash recomputation spread over a process pool.
+
+    Hash and PoW checks don't depend on each other, so they run in chunks across
+    workers; only the index / previous_hash link checks are sequential and they are
+    done in one cheap pass in this process. The reported first_invalid_index is the
+    smallest failing position over all checks, i.e. exactly what the serial
+    Blockchain.validate_chain_structure() reports.
+
+    One pool lives as long as the validator. Call start() early, before the process
+    starts other threads: with the "fork" start method a worker forked from a
+    multithreaded process can inherit locks held by threads that don't exist in it.
+    Each task carries its own marshalled slice of blocks, so this works the same under
+    spawn or forkserver, and at most CHUNKS_IN_FLIGHT_PER_WORKER slices per worker are
+    serialized at any time.
+    """
+
+    def __init__(self, workers=None, chunk_size=DEFAULT_VALIDATION_CHUNK_SIZE, mp_context=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._stop_event = None
+        self._pool = None
+        self._lock = threading.Lock() # One validate() at a time shares the pool and stop event
+
+    def start(self):
+        """Starts the worker pool now instead of on the first validate()."""
+        with self._lock:
+            self._ensure_pool()
+        return self
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._stop_event = self._ctx.Event()
+            self._pool = self._ctx.Pool(self.workers, initializer=_init_worker, initargs=(self._stop_event,))
+        return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+    @staticmethod
+    def first_broken_link(chain_to_validate, start_index=0):
+        """Sequential index / previous_hash pass. Returns the first failing position or None."""
+        if start_index == 0 and chain_to_validate[0].index != 0:
+            return 0
+        for i in range(max(1, start_index), len(chain_to_validate)):
+            current_block = chain_to_validate[i]
+            previous_block = chain_to_validate[i - 1]
+            if current_block.index != previous_block.index + 1 or current_block.previous_hash != previous_block.hash:
+                return i
+        return None
+
+    def _first_failing_position(self, chain_to_validate, start, end):
+        """Hash / PoW check of positions [start, end) on the pool. Returns the first failing position or None."""
+        with self._lock:
+            pool = self._ensure_pool()
+            self._stop_event.clear()
+            pending = deque() # AsyncResults in chunk order
+            next_start = start
+            try:
+                while True:
+                    while next_start < end and len(pending) < self.workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        chunk_end = min(next_start + self.chunk_size, end)
+                        pending.append(pool.apply_async(_check_chunk,
+                                                        ((next_start, _pack_blocks(chain_to_validate[next_start:chunk_end])),)))
+                        next_start = chunk_end
+                    if not pending:
+                        return None
+                    # Results are taken in chunk order, so the first failure found is the earliest one
+                    failed_position = pending.popleft().get()
+                    if failed_position is not None:
+                        return failed_position
+            finally:
+                # Chunks still in flight are all later ones and can't matter any more
+                self._stop_event.set()
+                for result in pending:
+                    result.wait()
+
+    def validate(self, chain_to_validate, start_index=0):
+        """Same contract as Blockchain.validate_chain_structure(chain_to_validate, start_index)."""
+        if not chain_to_validate:
+            return {'is_valid': True, 'first_invalid_index': None}
+
+        started = perf_counter()
+        broken_link = self.first_broken_link(chain_to_validate, start_index)
+        # Nothing past a broken link can change the answer, so don't hash it
+        hash_end = len(chain_to_validate) if broken_link is None else broken_link
+        first_invalid = broken_link
+
+        if hash_end > start_index:
+            failed_position = self._first_failing_position(chain_to_validate, start_index, hash_end)
+            if failed_position is not None:
+                first_invalid = failed_position
+
+        blocks_checked = len(chain_to_validate) - start_index
+        elapsed = perf_counter() - started
+        if blocks_checked > 0:
+            REGISTRY.histogram('validation_seconds_per_block').observe(elapsed / blocks_checked)
+        log.info("Batch validation of %s blocks finished in %.3fs. First invalid index: %s",
+                 blocks_checked, elapsed, first_invalid)
+        return {'is_valid': first_invalid is None, 'first_invalid_index': first_invalid}
@@ -9,6 +9,10 @@ import './index.css';
 
 const API_URL = 'http://127.0.0.1:5001/api';
 
+// Mempool entries carry their txid so mempool events can add/remove them; highest fee first
+const withTxids = (transactions, txids) => transactions.map((tx, i) => ({ ...tx, txid: txids?.[i] }));
+const byFee = (a, b) => Number(b.fee ?? 0) - Number(a.fee ?? 0);
+
 function App() {
     // --- State (remains the same) ---
     const [chain, setChain] = useState([]); // Initial state is an empty array
@@ -17,11 +21,16 @@ function App() {
     const [currentDifficulty, setCurrentDifficulty] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
     const [isMining, setIsMining] = useState(false);
+    const [miningJob, setMiningJob] = useState(null); // Latest status of the background mining job
     const [isAddingTransaction, setIsAddingTransaction] = useState(false);
     const [isValidating, setIsValidating] = useState(false);
     const [error, setError] = useState(null);
     const [chainValidity, setChainValidity] = useState({ isValid: true, firstInvalidIndex: null });
     const containerRef = useRef();
+    // Last chain received from the backend (never the locally tampered copy), used for delta fetches
+    const chainRef = useRef([]);
+    const miningJobRef = useRef(null);
+    const finishedJobIdRef = useRef(null);
 
     // --- Data Fetching and Actions (remain the same) ---
     const fetchData = useCallback(async (isReset = false) => {
@@ -31,8 +40,12 @@ function App() {
              setSelectedBlock(null);
         }
         try {
+            // Unless resetting, only ask for the blocks after our current tip
+            const knownChain = isReset ? [] : chainRef.current;
+            const tip = knownChain.length > 0 ? knownChain[knownChain.length - 1] : null;
+            const chainParams = tip ? { since_index: tip.index, since_hash: tip.hash } : {};
             const [chainResponse, mempoolResponse] = await Promise.all([
-                axios.get(`${API_URL}/blockchain`),
+                axios.get(`${API_URL}/blockchain`, { params: chainParams }),
                 axios.get(`${API_URL}/mempool`)
             ]);
 
@@ -40,16 +53,22 @@ function App() {
             console.log("Frontend: Fetched mempool data:", mempoolResponse.data);
 
             // Ensure fetchedChain is always an array, even if API returns null/undefined
-            const fetchedChain = Array.isArray(chainResponse.data.chain) ? chainResponse.data.chain : [];
+            const fetchedBlocks = Array.isArray(chainResponse.data.chain) ? chainResponse.data.chain : [];
+            const fetchedChain = chainResponse.data.delta
+                ? [...knownChain.slice(0, chainResponse.data.from), ...fetchedBlocks]
+                : fetchedBlocks;
+            chainRef.current = fetchedChain;
             setChain(fetchedChain);
             setCurrentDifficulty(chainResponse.data.current_difficulty);
-            setMempool(Array.isArray(mempoolResponse.data.transactions) ? mempoolResponse.data.transactions : []);
+            setMempool(Array.isArray(mempoolResponse.data.transactions)
+                ? withTxids(mempoolResponse.data.transactions, mempoolResponse.data.txids) : []);
             setChainValidity({ isValid: true, firstInvalidIndex: null });
 
         } catch (err) {
             console.error("Error fetching data:", err);
             const errorMsg = err.response?.data?.message || err.message || "Failed to load data.";
             setError(`Data Loading Error: ${errorMsg}. Is the backend running?`);
+            chainRef.current = [];
             setChain([]); // Ensure chain is an empty array on error
             setMempool([]);
             setCurrentDifficulty(null);
@@ -59,21 +78,97 @@ function App() {
         }
     }, []);
 
+    const updateMiningJob = useCallback((job) => {
+        const active = job.status === 'queued' || job.status === 'running';
+        miningJobRef.current = active ? job : null;
+        if (!active) finishedJobIdRef.current = job.job_id;
+        setMiningJob(active ? job : null);
+        setIsMining(active);
+        if (job.status === 'failed') {
+            setError(`Mining Error: ${job.error}. Check backend logs.`);
+        } else if (job.status === 'cancelled') {
+            setError("Mining cancelled. Transactions were returned to the mempool.");
+        }
+    }, []);
+
+    // Load once, then follow the backend's event stream instead of re-fetching after every action
     useEffect(() => {
-        fetchData();
-    }, [fetchData]);
+        let source = null;
+        let closed = false;
+
+        const handlers = {
+            block: ({ block }) => {
+                const known = chainRef.current;
+                const tip = known.length > 0 ? known[known.length - 1] : null;
+                if (tip && block.index <= tip.index) return; // Already have it (a reorg event follows if it differs)
+                if (!tip || block.index !== tip.index + 1 || block.previous_hash !== tip.hash) {
+                    fetchData(); // Missed something: catch up with a delta fetch
+                    return;
+                }
+                chainRef.current = [...known, block];
+                setChain(prev => [...prev, block]);
+            },
+            reorg: ({ fork_height }) => {
+                // Keep the shared prefix and fetch the new branch from there
+                chainRef.current = chainRef.current.slice(0, fork_height);
+                fetchData();
+            },
+            mempool: ({ added, removed }) => {
+                const removedIds = new Set(removed);
+                setMempool(prev => {
+                    const known = new Set(prev.map(tx => tx.txid));
+                    return [...prev, ...added.filter(tx => !known.has(tx.txid))]
+                        .filter(tx => !removedIds.has(tx.txid))
+                        .sort(byFee);
+                });
+            },
+            difficulty: ({ difficulty }) => setCurrentDifficulty(difficulty),
+            mining: updateMiningJob,
+            resync: async () => {
+                // The stream can't replay what we missed: refetch (and refresh our mining job, if any)
+                await fetchData();
+                const job = miningJobRef.current;
+                if (job) {
+                    try {
+                        const statusResponse = await axios.get(`${API_URL}/mine_block/${job.job_id}`);
+                        updateMiningJob(statusResponse.data);
+                    } catch (err) {
+                        console.error("Error refreshing mining job:", err);
+                    }
+                }
+            },
+        };
+
+        fetchData().then(() => {
+            if (closed) return;
+            // Resume right after the tip we just loaded; on reconnects the browser sends Last-Event-ID
+            const known = chainRef.current;
+            const tip = known.length > 0 ? known[known.length - 1] : null;
+            const params = tip ? `?since_index=${tip.index}&since_hash=${tip.hash}` : '';
+            source = new EventSource(`${API_URL}/events${params}`);
+            Object.entries(handlers).forEach(([type, handler]) => {
+                source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+            });
+            source.onerror = () => console.warn("Frontend: Event stream interrupted, reconnecting...");
+        });
+
+        return () => {
+            closed = true;
+            if (source) source.close();
+        };
+    }, [fetchData, updateMiningJob]);
 
     const handleAddTransaction = async (transactionData) => {
          if (isAddingTransaction) return;
          setIsAddingTransaction(true);
          setError(null);
-         console.log("Frontend: Sending transaction:", transactionData);
+         // One key per payment: a retried request carries the same key and is rejected as a duplicate
+         const payment = { ...transactionData, idempotency_key: crypto.randomUUID() };
+         console.log("Frontend: Sending transaction:", payment);
          try {
-             const response = await axios.post(`${API_URL}/add_transaction`, transactionData);
+             const response = await axios.post(`${API_URL}/add_transaction`, payment);
+             // The mempool panel updates from the mempool event
              console.log("Frontend: Add transaction response:", response.data);
-             // Refresh mempool state
-             const mempoolResponse = await axios.get(`${API_URL}/mempool`);
-             setMempool(Array.isArray(mempoolResponse.data.transactions) ? mempoolResponse.data.transactions : []);
          } catch (err) {
              console.error("Error adding transaction:", err);
              const errorMsg = err.response?.data?.message || err.message || "Failed to add transaction.";
@@ -99,26 +194,34 @@ function App() {
        console.log("Frontend: Sending mine request (using mempool)...");
 
        try {
-           const response = await axios.post(`${API_URL}/mine_block`);
-           console.log("Frontend: Mine request successful", response.data);
-           // Ensure response data leads to array state
-           setChain(Array.isArray(response.data.chain) ? response.data.chain : []);
-           setCurrentDifficulty(response.data.current_difficulty);
-           setMempool([]);
-           setSelectedBlock(null);
-           setChainValidity({ isValid: true, firstInvalidIndex: null });
-
+           // Mining runs as a background job on the backend; its progress, the new block and
+           // the mempool changes all arrive as events
+           const startResponse = await axios.post(`${API_URL}/mine_block`);
+           console.log("Frontend: Mining job started", startResponse.data);
+           // Unless the job's events already got here first
+           if (finishedJobIdRef.current !== startResponse.data.job_id && !miningJobRef.current) {
+               miningJobRef.current = startResponse.data;
+               setMiningJob(startResponse.data);
+           }
        } catch (err) {
            console.error("Error mining block:", err);
            const errorMsg = err.response?.data?.message || err.message || "Failed to mine block.";
            setError(`Mining Error: ${errorMsg}. Check backend logs.`);
+           setIsMining(false);
            // Optionally reset chain on error, or rely on user action/refetch
            // setChain([]); // Example: Reset on error
-       } finally {
-           setIsMining(false);
        }
     };
 
+    const handleCancelMining = async () => {
+        if (!miningJob) return;
+        try {
+            await axios.post(`${API_URL}/mine_block/${miningJob.job_id}/cancel`);
+        } catch (err) {
+            console.error("Error cancelling mining job:", err);
+        }
+    };
+
     const triggerBackendValidation = useCallback(async (chainToValidate) => {
          // Ensure chainToValidate is always an array before sending
          const validChainPayload = Array.isArray(chainToValidate) ? chainToValidate : [];
@@ -242,6 +345,11 @@ function App() {
                         <button onClick={handleResetChain} disabled={isLoading || isMining} title="Reload chain and mempool from backend">
                             Reset Chain (Fetch)
                         </button>
+                        {isMining && (
+                            <button onClick={handleCancelMining} disabled={!miningJob} title="Stop the running mining job">
+                                Cancel Mining
+                            </button>
+                        )}
                          {/* Only show validity status if chain is ready */}
                          {isChainReady && (
                              <span className={`validation-status ${chainValidity.isValid ? 'valid' : 'invalid'}`}>
@@ -258,7 +366,12 @@ function App() {
 
                     <div className="status-bar">
                         {isLoading && <div className="status-indicator loading">Loading Data...</div>}
-                        {isMining && <div className="status-indicator mining">Mining Block...</div>}
+                        {isMining && (
+                            <div className="status-indicator mining">
+                                Mining Block...
+                                {miningJob && ` ${miningJob.nonces_tried.toLocaleString()} nonces, ${(miningJob.hash_rate / 1000).toFixed(1)} kH/s, ${miningJob.elapsed.toFixed(1)}s`}
+                            </div>
+                        )}
                         {isAddingTransaction && <div className="status-indicator loading">Adding Transaction...</div>}
                         {showLoadErrorMessage && <div className="status-indicator error">{error}</div>} {/* Show error if loading failed */}
                     </div>
@@ -16,10 +16,11 @@ const MempoolPanel = ({ transactions }) => {
       <h4>Mempool ({transactions.length} Pending)</h4>
       <ul>
         {transactions.map((tx, index) => (
-          <li key={index}>
+          <li key={tx.txid ?? index}>
             <span>From: {tx.from_addr}</span>
             <span>To: {tx.to_addr}</span>
             <span>Amount: {tx.amount}</span>
+            {tx.fee !== undefined && <span>Fee: {tx.fee}</span>}
           </li>
         ))}
       </ul>
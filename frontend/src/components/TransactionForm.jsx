@@ -5,6 +5,7 @@ const TransactionForm = ({ onAddTransaction, isAdding }) => {
   const [fromAddr, setFromAddr] = useState('');
   const [toAddr, setToAddr] = useState('');
   const [amount, setAmount] = useState('');
+  const [fee, setFee] = useState(''); // Optional, higher fees get mined first
 
   const handleSubmit = (e) => {
     e.preventDefault();
@@ -13,18 +14,25 @@ const TransactionForm = ({ onAddTransaction, isAdding }) => {
       alert('Please fill in valid From, To, and a positive Amount.');
       return;
     }
+    const parsedFee = fee.trim() ? parseFloat(fee) : 0;
+    if (isNaN(parsedFee) || parsedFee < 0) {
+      alert('Fee must be zero or a positive number.');
+      return;
+    }
     if (isAdding) return; // Prevent double submission
 
     onAddTransaction({
       from_addr: fromAddr,
       to_addr: toAddr,
       amount: parsedAmount,
+      fee: parsedFee,
     });
 
     // Clear form after submission
     setFromAddr('');
     setToAddr('');
     setAmount('');
+    setFee('');
   };
 
   return (
@@ -59,6 +67,16 @@ const TransactionForm = ({ onAddTransaction, isAdding }) => {
         required
         aria-label="Transaction Amount"
       />
+      <input
+        type="number"
+        value={fee}
+        onChange={(e) => setFee(e.target.value)}
+        placeholder="Fee (optional, e.g., 0.5)"
+        min="0"
+        step="any"
+        disabled={isAdding}
+        aria-label="Transaction Fee"
+      />
       <button type="submit" disabled={isAdding || !fromAddr.trim() || !toAddr.trim() || !amount.trim()}>
         {isAdding ? 'Adding...' : 'Add to Mempool'}
       </button>